@@ -1,8 +1,19 @@
 import os
-import json
+import re
+import atexit
+import asyncio
 import time
 import datetime
-from dotenv import load_dotenv
+import sqlite3
+import sys
+import threading
+import types
+from functools import lru_cache
+import numpy as np
+import httpx
+import orjson
+from bootstrap import enable_input_history, load_environment
+from openai import OpenAI
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools.reasoning import ReasoningTools
@@ -10,15 +21,32 @@ from agno.tools import tool
 from agno.storage.sqlite import SqliteStorage
 from agno.knowledge.text import TextKnowledgeBase
 from agno.vectordb.lancedb import LanceDb
-from agno.embedder.openai import OpenAIEmbedder
 from agno.memory.v2.db.sqlite import SqliteMemoryDb
 from agno.memory.v2.memory import Memory
+from kb_common import (
+    EmbeddingCache,
+    NormalizedOpenAIEmbedder,
+    knowledge_base_is_loaded,
+    load_in_batches,
+)
 
 # Load environment variables
-load_dotenv()
+load_environment()
 
 completion_model = os.getenv("COMPLETION_MODEL", "gpt-4.1-mini")
 
+# The OpenAI SDK's 600s default read timeout, so long completions aren't cut
+# off, with a short connect timeout
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+# Shared HTTP clients so API calls reuse the same HTTP/2 connections. The agent
+# runs through the async path, while the embedder only makes sync requests.
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+async_http_client = httpx.AsyncClient(
+    http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT
+)
+http_client = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
 # Define a database of Big Tech companies and their AI investments
 COMPANY_DATABASE = {
     "microsoft": {
@@ -165,9 +193,225 @@ USER_PREFERENCES = {
     "notification_threshold": 5.0,  # percentage change to trigger notification
 }
 
+# Freeze the reference data and intern the company IDs so lookups with interned
+# keys can short-circuit on identity. daily_change is simulated per call, not
+# stored.
+COMPANY_DATABASE = types.MappingProxyType(
+    {
+        sys.intern(company_id): company
+        for company_id, company in COMPANY_DATABASE.items()
+    }
+)
+MARKET_DATA = types.MappingProxyType(
+    {
+        sys.intern(company_id): types.MappingProxyType(data)
+        for company_id, data in MARKET_DATA.items()
+    }
+)
+
+# Common alternative names for the companies in the database
+COMPANY_ALIASES = {"google": sys.intern("alphabet"), "facebook": sys.intern("meta")}
+
+
+def normalize_company_name(company_name):
+    """Lowercase, strip and intern a company name from tool input"""
+    return sys.intern(company_name.lower().strip())
+
+
+# Normalized company names mapped to the company ID used as the lookup key
+COMPANY_KEYS = {
+    **{
+        company["name"].lower(): company_id
+        for company_id, company in COMPANY_DATABASE.items()
+    },
+    **COMPANY_ALIASES,
+}
+
+
+def resolve_company_key(company_name):
+    """Get the ID of the known company a name refers to, or None if there is none"""
+    name = normalize_company_name(company_name)
+    if name in COMPANY_KEYS:
+        return COMPANY_KEYS[name]
+    # Variants such as "Microsoft Corp" or "Google LLC" contain an ID or alias
+    for word in re.findall(r"\w+", name):
+        if word in COMPANY_DATABASE:
+            return sys.intern(word)
+        if word in COMPANY_ALIASES:
+            return COMPANY_ALIASES[word]
+    return None
+
+
+def company_key(company_name):
+    """Normalize a company name to the key stored with its recommendations"""
+    return resolve_company_key(company_name) or normalize_company_name(company_name)
+
+
+def to_json(data):
+    """Serialize tool output as compact JSON, since the model doesn't need indentation"""
+    return orjson.dumps(data).decode()
+
+
+# Pre-rendered JSON for the static data returned by the tools
+COMPANY_JSON = {
+    company_id: to_json(company) for company_id, company in COMPANY_DATABASE.items()
+}
+USER_PREFERENCES_JSON = to_json(USER_PREFERENCES)
+
+
+def split_market_json(data):
+    """Render market data as JSON split around daily_change, the only field that changes"""
+    rendered = to_json({**data, "daily_change": "__daily_change__"})
+    prefix, suffix = rendered.split('"__daily_change__"')
+    return prefix, suffix
+
+
+MARKET_JSON_PARTS = {
+    company_id: split_market_json(data) for company_id, data in MARKET_DATA.items()
+}
+
+# Company IDs and the first-character codes used to simulate daily changes
+_company_ids = tuple(MARKET_DATA)
+_first_char_codes = np.array(
+    [ord(company_id[0]) for company_id in _company_ids], dtype=np.int32
+)
+
 # Database for storing recommendations
 recommendation_db_file = "sqlite_data/recommendations.db"
 
+CREATE_RECOMMENDATIONS_SQL = """
+CREATE TABLE IF NOT EXISTS recommendations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    company TEXT,
+    recommendation TEXT,
+    confidence REAL,
+    timestamp REAL,
+    company_key TEXT COLLATE NOCASE
+)
+"""
+
+CREATE_RECOMMENDATION_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_rec_company_key ON recommendations (company_key, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_rec_timestamp ON recommendations (timestamp DESC);
+"""
+
+INSERT_RECOMMENDATION_SQL = "INSERT INTO recommendations (company, recommendation, confidence, timestamp, company_key) VALUES (?, ?, ?, ?, ?)"
+
+# Number of queued recommendations that triggers a write to the database
+RECOMMENDATION_FLUSH_THRESHOLD = 16
+
+# Shared connection used by the recommendation tools. Tool calls can run in
+# worker threads, so every access goes through the lock.
+_recommendation_conn = None
+_recommendation_lock = threading.Lock()
+
+# Recommendations waiting to be written in a single transaction
+_pending_recommendations = []
+
+
+def get_recommendation_connection():
+    """Open the recommendations database once and reuse the connection"""
+    global _recommendation_conn
+    if _recommendation_conn is None:
+        conn = sqlite3.connect(
+            recommendation_db_file, check_same_thread=False, isolation_level=None
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(CREATE_RECOMMENDATIONS_SQL)
+        migrate_company_keys(conn)
+        migrate_timestamps(conn)
+        conn.executescript(CREATE_RECOMMENDATION_INDEXES_SQL)
+        _recommendation_conn = conn
+    return _recommendation_conn
+
+
+def migrate_company_keys(conn):
+    """Add and backfill the company_key column for databases created before it existed"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(recommendations)")}
+    if "company_key" in columns:
+        return
+    conn.execute(
+        "ALTER TABLE recommendations ADD COLUMN company_key TEXT COLLATE NOCASE"
+    )
+    rows = conn.execute("SELECT id, company FROM recommendations").fetchall()
+    conn.executemany(
+        "UPDATE recommendations SET company_key = ? WHERE id = ?",
+        [(company_key(company or ""), row_id) for row_id, company in rows],
+    )
+
+
+def parse_timestamp(timestamp):
+    """Convert a stored timestamp to epoch seconds, or None if it can't be read"""
+    if timestamp is None or isinstance(timestamp, (int, float)):
+        return timestamp
+    try:
+        return datetime.datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return float(timestamp)
+    except (TypeError, ValueError):
+        return None
+
+
+def migrate_timestamps(conn):
+    """Convert ISO timestamp strings from older databases to Unix epoch seconds"""
+    columns = {
+        row[1]: row[2] for row in conn.execute("PRAGMA table_info(recommendations)")
+    }
+    if columns["timestamp"].upper() == "REAL":
+        return
+    # A TEXT column would store epoch floats as strings, so rebuild the table
+    # with a REAL column and convert the existing rows. Rows with a missing or
+    # unreadable timestamp are kept with a NULL one.
+    rows = conn.execute(
+        "SELECT id, company, recommendation, confidence, timestamp, company_key FROM recommendations"
+    ).fetchall()
+    conn.execute("BEGIN")
+    try:
+        conn.execute("DROP TABLE recommendations")
+        conn.execute(CREATE_RECOMMENDATIONS_SQL)
+        conn.executemany(
+            "INSERT INTO recommendations (id, company, recommendation, confidence, timestamp, company_key) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (row_id, company, rec, confidence, parse_timestamp(timestamp), key)
+                for row_id, company, rec, confidence, timestamp, key in rows
+            ],
+        )
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _write_pending_recommendations(conn):
+    """Insert all queued recommendations in one transaction (caller holds the lock)"""
+    if not _pending_recommendations:
+        return
+    conn.execute("BEGIN")
+    try:
+        conn.executemany(INSERT_RECOMMENDATION_SQL, _pending_recommendations)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    _pending_recommendations.clear()
+
+
+def flush_recommendations():
+    """Write any queued recommendations to the database"""
+    if not _pending_recommendations:
+        return
+    conn = get_recommendation_connection()
+    with _recommendation_lock:
+        _write_pending_recommendations(conn)
+
+
+# Make sure queued recommendations are not lost when the process exits
+atexit.register(flush_recommendations)
+
+
 @tool
 def get_company_info(company_name: str) -> str:
     """Get detailed information about a Big Tech company's AI investments.
@@ -178,17 +422,14 @@ def get_company_info(company_name: str) -> str:
     Returns:
         Detailed information about the company's AI investments
     """
-    company_name = company_name.lower().strip()
+    company_name = normalize_company_name(company_name)
 
     # Handle common variations
-    if company_name == "google":
-        company_name = "alphabet"
-    elif company_name == "facebook":
-        company_name = "meta"
-
-    if company_name in COMPANY_DATABASE:
-        company = COMPANY_DATABASE[company_name]
-        return json.dumps(company, indent=2)
+    company_name = COMPANY_ALIASES.get(company_name, company_name)
+
+    company_json = COMPANY_JSON.get(company_name)
+    if company_json is not None:
+        return company_json
     else:
         return f"Company '{company_name}' not found in the database."
 
@@ -203,20 +444,18 @@ def get_market_data(company_name: str) -> str:
     Returns:
         Latest market data for the company
     """
-    company_name = company_name.lower().strip()
+    company_name = normalize_company_name(company_name)
 
     # Handle common variations
-    if company_name == "google":
-        company_name = "alphabet"
-    elif company_name == "facebook":
-        company_name = "meta"
+    company_name = COMPANY_ALIASES.get(company_name, company_name)
 
     if company_name in MARKET_DATA:
         # Simulate daily change
-        MARKET_DATA[company_name]["daily_change"] = round(
+        daily_change = round(
             (2 * (time.time() % 10) / 10 - 1) * 3, 2
         )  # Random value between -3% and +3%
-        return json.dumps(MARKET_DATA[company_name], indent=2)
+        prefix, suffix = MARKET_JSON_PARTS[company_name]
+        return prefix + to_json(daily_change) + suffix
     else:
         return f"Market data for company '{company_name}' not found."
 
@@ -228,7 +467,7 @@ def get_user_preferences() -> str:
     Returns:
         User's investment preferences
     """
-    return json.dumps(USER_PREFERENCES, indent=2)
+    return USER_PREFERENCES_JSON
 
 
 @tool
@@ -244,39 +483,34 @@ def save_recommendation(company_name: str, recommendation: str, confidence: floa
         Confirmation of saving the recommendation
     """
     # Format the recommendation data
-    timestamp = datetime.datetime.now().isoformat()
-    
-    # Ensure the sqlite_data directory exists
-    os.makedirs("sqlite_data", exist_ok=True)
-    
-    # Store in SQLite database for persistence
-    import sqlite3
-    conn = sqlite3.connect(recommendation_db_file)
-    cursor = conn.cursor()
-    
-    # Create table if it doesn't exist
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS recommendations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        company TEXT,
-        recommendation TEXT,
-        confidence REAL,
-        timestamp TEXT
-    )
-    ''')
-    
-    # Insert the recommendation
-    cursor.execute(
-        "INSERT INTO recommendations (company, recommendation, confidence, timestamp) VALUES (?, ?, ?, ?)",
-        (company_name, recommendation, confidence, timestamp)
-    )
-    
-    conn.commit()
-    conn.close()
-    
+    timestamp = time.time()
+
+    # Queue the recommendation and store the batch in SQLite once it is full
+    conn = get_recommendation_connection()
+    with _recommendation_lock:
+        _pending_recommendations.append(
+            (
+                company_name,
+                recommendation,
+                confidence,
+                timestamp,
+                company_key(company_name),
+            )
+        )
+        if len(_pending_recommendations) >= RECOMMENDATION_FLUSH_THRESHOLD:
+            _write_pending_recommendations(conn)
+
     return f"Recommendation for {company_name} saved: {recommendation} (Confidence: {confidence}%)"
 
 
+@lru_cache(maxsize=1024)
+def format_timestamp(timestamp):
+    """Format a stored epoch timestamp in a more readable form"""
+    if timestamp is None:
+        return "unknown"
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+
 @tool
 def get_previous_recommendations(company_name: str = "") -> str:
     """Get previous recommendations from the agent's memory.
@@ -287,66 +521,49 @@ def get_previous_recommendations(company_name: str = "") -> str:
     Returns:
         Previous recommendations
     """
-    # Ensure the sqlite_data directory exists
-    os.makedirs("sqlite_data", exist_ok=True)
-    
-    # Check if the database file exists
-    if not os.path.exists(recommendation_db_file):
-        if company_name:
-            return f"No previous recommendations found for {company_name}."
-        else:
-            return "No previous recommendations found in memory."
-    
-    # Query the SQLite database
-    import sqlite3
-    conn = sqlite3.connect(recommendation_db_file)
-    cursor = conn.cursor()
-    
+    # Query the SQLite database. The table is created when the connection is
+    # opened, so there is no need to check the file or sqlite_master first.
+    conn = get_recommendation_connection()
+
     try:
-        # Check if the table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='recommendations'")
-        if not cursor.fetchone():
-            conn.close()
-            if company_name:
-                return f"No previous recommendations found for {company_name}."
+        with _recommendation_lock:
+            # Write queued recommendations first so they show up in the results
+            _write_pending_recommendations(conn)
+            key = resolve_company_key(company_name) if company_name else None
+            if key:
+                cursor = conn.execute(
+                    "SELECT company, recommendation, confidence, timestamp FROM recommendations WHERE company_key = ? ORDER BY timestamp DESC",
+                    (key,),
+                )
+            elif company_name:
+                # Unknown companies are matched on the stored name instead
+                cursor = conn.execute(
+                    "SELECT company, recommendation, confidence, timestamp FROM recommendations WHERE company LIKE ? ORDER BY timestamp DESC",
+                    (f"%{company_name.strip()}%",),
+                )
             else:
-                return "No previous recommendations found in memory."
-        
-        # Query recommendations
-        if company_name:
-            cursor.execute(
-                "SELECT company, recommendation, confidence, timestamp FROM recommendations WHERE LOWER(company) LIKE LOWER(?)",
-                (f"%{company_name}%",)
-            )
-        else:
-            cursor.execute("SELECT company, recommendation, confidence, timestamp FROM recommendations ORDER BY timestamp DESC")
-        
-        recommendations = cursor.fetchall()
-        conn.close()
-        
+                cursor = conn.execute(
+                    "SELECT company, recommendation, confidence, timestamp FROM recommendations ORDER BY timestamp DESC"
+                )
+            recommendations = cursor.fetchall()
+
         if not recommendations:
             if company_name:
                 return f"No previous recommendations found for {company_name}."
             else:
                 return "No previous recommendations found in memory."
-        
+
         # Format the results
-        result = "Previous recommendations:\n\n"
-        for rec in recommendations:
-            company, rec_type, confidence, timestamp = rec
-            # Parse the timestamp to a more readable format
-            try:
-                dt = datetime.datetime.fromisoformat(timestamp)
-                formatted_date = dt.strftime("%Y-%m-%d %H:%M")
-            except:
-                formatted_date = timestamp
-                
-            result += f"- {company}: {rec_type} (Confidence: {confidence}%, Date: {formatted_date})\n"
-        
-        return result
-        
+        parts = ["Previous recommendations:\n"]
+        for company, rec_type, confidence, timestamp in recommendations:
+            parts.append(
+                f"- {company}: {rec_type} (Confidence: {confidence}%, Date: {format_timestamp(timestamp)})"
+            )
+        parts.append("")
+
+        return "\n".join(parts)
+
     except Exception as e:
-        conn.close()
         return f"Error retrieving recommendations: {str(e)}"
 
 
@@ -365,22 +582,54 @@ def create_notification(company_name: str, event_type: str, message: str) -> str
     return f"Notification created for {company_name} ({event_type}): {message}"
 
 
-def setup_knowledge_base():
-    """Set up a knowledge base using LanceDB and the content from content_data/content.txt"""
+@lru_cache(maxsize=1)
+def _build_knowledge_base(embedding_model):
+    """Build the knowledge base once per embedding model"""
     # Create the knowledge base with LanceDB as the vector database
-    knowledge_base = TextKnowledgeBase(
+    return TextKnowledgeBase(
         path="content_data",  # Use the content_data directory which contains content.txt
         vector_db=LanceDb(
             table_name="embeddings_goal_memory",
             uri="sqlite_data",
-            # Use OpenAI embeddings
-            embedder=OpenAIEmbedder(
-                id=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+            # Use unit-length OpenAI embeddings, which can be fetched in batches
+            embedder=NormalizedOpenAIEmbedder(
+                id=embedding_model,
+                openai_client=OpenAI(http_client=http_client),
+                cache=EmbeddingCache(embedding_model),
             ),
         ),
     )
 
-    return knowledge_base
+
+def setup_knowledge_base():
+    """Set up a knowledge base using LanceDB and the content from content_data/content.txt"""
+    return _build_knowledge_base(os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"))
+
+
+# Agent instructions, built once and shared by every agent instance
+AGENT_INSTRUCTIONS = (
+    "You are an AI investment advisor specializing in Big Tech AI investments.",
+    "You have memory to store state and previous results.",
+    "You can learn from past interactions and adapt your recommendations.",
+    "You can perform recurring tasks like daily recommendations and notifications.",
+    "You track market data and company information to provide timely advice.",
+    "You consider user preferences when making recommendations.",
+    "You can create notifications for significant events or price changes.",
+    "You maintain a history of your recommendations and their performance.",
+    "You can compare current data with historical data to identify trends.",
+    "You provide personalized recommendations based on user preferences and market conditions.",
+    "You focus on Big Tech companies' AI investments and their potential returns.",
+    "You know that Big Tech companies are planning to spend over $320 billion on AI in 2025.",
+    "You are aware that Microsoft plans to spend $80 billion, Google $75 billion, and Amazon over $100 billion on AI in 2025.",
+    "When asked about previous recommendations, use the get_previous_recommendations tool to retrieve them.",
+    "IMPORTANT: ALWAYS use the save_recommendation tool when making new recommendations to ensure they are stored in memory.",
+    "When generating daily updates, check for significant market changes and create notifications if needed.",
+    "Remember user preferences and tailor your recommendations accordingly.",
+    "When users tell you their name or preferences, store this information in your memory.",
+    "When users ask who they are, retrieve their information from your memory.",
+    "Always check previous recommendations before making new ones to ensure consistency.",
+    "If a user expresses disinterest in a particular company, remember this preference and avoid recommending it in the future.",
+)
 
 
 def create_goal_driven_memory_agent():
@@ -390,14 +639,18 @@ def create_goal_driven_memory_agent():
     It can learn, adapt, and perform recurring tasks.
     Example: daily recommendations, automatic notifications.
     """
+    # Create the data directory and the recommendations schema once at startup
+    os.makedirs("sqlite_data", exist_ok=True)
+    get_recommendation_connection()
+
     # Set up the knowledge base
     knowledge_base = setup_knowledge_base()
 
     # Check if we need to load the knowledge base
-    # If the vector database already exists, we can skip this step
-    if not os.path.exists("sqlite_data/embeddings_goal_memory"):
+    # Skip this step only if a previous load finished for the same content
+    if not knowledge_base_is_loaded(knowledge_base):
         print("Loading knowledge base...")
-        knowledge_base.load(upsert=True)
+        load_in_batches(knowledge_base)
         print("Knowledge base loaded successfully!")
     else:
         print("Using existing knowledge base.")
@@ -418,7 +671,7 @@ def create_goal_driven_memory_agent():
     # Create the agent with memory
     agent = Agent(
         name="AI Investment Advisor",
-        model=OpenAIChat(id=completion_model),
+        model=OpenAIChat(id=completion_model, http_client=async_http_client),
         knowledge=knowledge_base,
         search_knowledge=True,
         # Use Agno's memory system
@@ -439,29 +692,7 @@ def create_goal_driven_memory_agent():
             get_previous_recommendations,
             create_notification,
         ],
-        instructions=[
-            "You are an AI investment advisor specializing in Big Tech AI investments.",
-            "You have memory to store state and previous results.",
-            "You can learn from past interactions and adapt your recommendations.",
-            "You can perform recurring tasks like daily recommendations and notifications.",
-            "You track market data and company information to provide timely advice.",
-            "You consider user preferences when making recommendations.",
-            "You can create notifications for significant events or price changes.",
-            "You maintain a history of your recommendations and their performance.",
-            "You can compare current data with historical data to identify trends.",
-            "You provide personalized recommendations based on user preferences and market conditions.",
-            "You focus on Big Tech companies' AI investments and their potential returns.",
-            "You know that Big Tech companies are planning to spend over $320 billion on AI in 2025.",
-            "You are aware that Microsoft plans to spend $80 billion, Google $75 billion, and Amazon over $100 billion on AI in 2025.",
-            "When asked about previous recommendations, use the get_previous_recommendations tool to retrieve them.",
-            "IMPORTANT: ALWAYS use the save_recommendation tool when making new recommendations to ensure they are stored in memory.",
-            "When generating daily updates, check for significant market changes and create notifications if needed.",
-            "Remember user preferences and tailor your recommendations accordingly.",
-            "When users tell you their name or preferences, store this information in your memory.",
-            "When users ask who they are, retrieve their information from your memory.",
-            "Always check previous recommendations before making new ones to ensure consistency.",
-            "If a user expresses disinterest in a particular company, remember this preference and avoid recommending it in the future.",
-        ],
+        instructions=list(AGENT_INSTRUCTIONS),
         markdown=True,
         show_tool_calls=True,
     )
@@ -469,37 +700,39 @@ def create_goal_driven_memory_agent():
     return agent
 
 
-def simulate_daily_update(agent, day_number):
+async def simulate_daily_update(agent, day_number):
     """Simulate a daily update for the agent"""
     today = datetime.datetime.now() + datetime.timedelta(days=day_number)
     date_str = today.strftime("%Y-%m-%d")
-    
+
     print(f"\n=== Daily Update: {date_str} (Day {day_number}) ===")
-    
+
     # Check for significant market changes
+    # Simulate daily changes for all companies at once based on the day number
+    changes = np.round(((day_number * 7 + _first_char_codes) % 15 - 7) / 2.0, 2)
+    threshold = USER_PREFERENCES["notification_threshold"]
     significant_changes = []
-    for company_id, data in MARKET_DATA.items():
-        # Simulate daily change based on day number for consistency
-        change = round(((day_number * 7 + ord(company_id[0])) % 15 - 7) / 2, 2)
-        MARKET_DATA[company_id]["daily_change"] = change
-        
-        if abs(change) >= USER_PREFERENCES["notification_threshold"]:
+    for company_id, change in zip(_company_ids, changes.tolist()):
+        if abs(change) >= threshold:
             significant_changes.append(company_id)
-    
+
     if significant_changes:
         companies_str = ", ".join([COMPANY_DATABASE[c]["name"] for c in significant_changes])
         prompt = f"Today is {date_str}. Generate daily recommendations and notifications. The following companies have significant price changes: {companies_str}."
     else:
         prompt = f"Today is {date_str}. Generate daily recommendations and notifications based on the latest market data."
-    
-    # Run the agent with the daily update prompt
-    response = agent.run(prompt)
-    
-    # Print the response
-    agent.print_response(prompt, stream=True)
 
+    # Run the agent with the daily update prompt and stream the response.
+    # The async path executes the tool calls of each model turn concurrently.
+    await agent.aprint_response(prompt, stream=True)
 
-def main():
+    # Persist the recommendations made during this day in one transaction
+    flush_recommendations()
+
+
+async def main():
+    # Let arrow keys recall questions from earlier runs
+    enable_input_history()
     print("Creating a Goal-Driven Agent with Memory...")
     agent = create_goal_driven_memory_agent()
 
@@ -507,7 +740,7 @@ def main():
     print("This demo shows an agent that has memory to store state and previous results.")
     print("It can learn, adapt, and perform recurring tasks.")
     print("Suitable for: daily recommendations, automatic notifications, etc.")
-    
+
     print("\nExample requests:")
     print("- 'What are your current investment recommendations?'")
     print("- 'Create a daily update for my portfolio'")
@@ -519,12 +752,12 @@ def main():
 
     # Run the agent in interactive mode or simulation mode
     mode = input("\nChoose mode (1: Interactive, 2: Simulation): ")
-    
+
     if mode == "2":
         # Simulation mode: Run daily updates for a week
         num_days = int(input("Enter number of days to simulate: "))
         for day in range(1, num_days + 1):
-            simulate_daily_update(agent, day)
+            await simulate_daily_update(agent, day)
             if day < num_days:
                 input("\nPress Enter to continue to the next day...")
     else:
@@ -535,12 +768,10 @@ def main():
                 break
 
             print(f"\nProcessing request: '{request}'...")
-            # Use the agent to process the request
-            response = agent.run(request)
-            
-            # Print the response
-            agent.print_response(request, stream=True)
+            # Use the agent to process the request, running independent
+            # tool calls concurrently
+            await agent.aprint_response(request, stream=True)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,9 +1,21 @@
-from dotenv import load_dotenv
+import httpx
+from bootstrap import enable_input_history, load_environment
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 
 # Load environment variables
-load_dotenv()
+load_environment()
+
+# The OpenAI SDK's 600s default read timeout, so long completions aren't cut
+# off, with a short connect timeout
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+# Shared HTTP client so every request reuses the same HTTP/2 connection
+http_client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    timeout=HTTP_TIMEOUT,
+)
 
 
 def create_prompt_only_agent():
@@ -15,7 +27,7 @@ def create_prompt_only_agent():
     """
     agent = Agent(
         name="AI Investment Content Creator",
-        model=OpenAIChat(id="gpt-4.1-mini"),
+        model=OpenAIChat(id="gpt-4.1-mini", http_client=http_client),
         # No knowledge base
         # No tools
         # No memory
@@ -42,6 +54,8 @@ def create_prompt_only_agent():
 
 
 def main():
+    # Let arrow keys recall questions from earlier runs
+    enable_input_history()
     print("Creating a Prompt-Only Agent (Stateless LLM)...")
     agent = create_prompt_only_agent()
 
@@ -1,103 +1,37 @@
 import os
-import json
-from dotenv import load_dotenv
+import asyncio
+from functools import lru_cache
+from bootstrap import enable_input_history, load_environment
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools import tool
 from agno.tools.reasoning import ReasoningTools
 from agno.knowledge.text import TextKnowledgeBase
 from agno.vectordb.lancedb import LanceDb
-from agno.embedder.openai import OpenAIEmbedder
+from agno.vectordb.distance import Distance
+from companies_data import (
+    COMPANY_DATABASE,
+    COMPANY_IDS,
+    COMPANY_JSON,
+    INVESTMENT_METRICS_JSON,
+    build_comparison_json,
+    company_not_found,
+    normalize_name,
+    resolve_company_id,
+    to_json,
+)
+from kb_common import (
+    SEARCH_NPROBES,
+    ensure_vector_index,
+    get_embedder,
+    keyword_search,
+)
 
 # Load environment variables
-load_dotenv()
+load_environment()
 
 completion_model = os.getenv("COMPLETION_MODEL", "gpt-4.1-mini")
 
-# Define a database of Big Tech companies and their AI investments
-COMPANY_DATABASE = {
-    "microsoft": {
-        "name": "Microsoft",
-        "planned_investment_2025": "$80 billion",
-        "investment_2024": "$53 billion",
-        "key_areas": ["Azure Cloud", "OpenAI Partnership", "Copilot Agents"],
-        "ceo": "Satya Nadella",
-        "stock_impact": "Lost $200 billion in market value after reporting weaker cloud growth",
-        "challenges": [
-            "Glitchy and costly Copilot agents",
-            "Slow enterprise adoption",
-            "ROI concerns",
-        ],
-    },
-    "alphabet": {
-        "name": "Alphabet (Google)",
-        "planned_investment_2025": "$75 billion",
-        "investment_2024": "$53 billion",
-        "key_areas": ["Gemini AI Models", "Cloud Infrastructure", "AI Research"],
-        "ceo": "Sundar Pichai",
-        "stock_impact": "8% drop, fifth-worst trading day in past decade",
-        "challenges": [
-            "Opaque usage metrics for Gemini",
-            "Integrating AI into search without cannibalizing ad revenue",
-        ],
-    },
-    "amazon": {
-        "name": "Amazon",
-        "planned_investment_2025": "$100+ billion",
-        "investment_2024": "$77 billion",
-        "key_areas": ["AWS Data Centers", "AI Infrastructure", "Specialized Chips"],
-        "ceo": "Andy Jassy",
-        "stock_impact": "Fell 7% in after-hours trading after investment announcement",
-        "challenges": ["Distant ROI", "Significant capital expenditure"],
-    },
-    "meta": {
-        "name": "Meta",
-        "planned_investment_2025": "Hundreds of billions",
-        "investment_2024": "$40 billion",
-        "key_areas": ["AI for Ad Targeting", "Llama Models", "AI Infrastructure"],
-        "ceo": "Mark Zuckerberg",
-        "stock_impact": "Positive reception, shares rising despite increased spending",
-        "challenges": ["Regulatory scrutiny", "Competition in AI space"],
-    },
-    "openai": {
-        "name": "OpenAI",
-        "planned_investment_2025": "$100 billion (with partners)",
-        "investment_2024": "Not publicly disclosed",
-        "key_areas": ["GPT Models", "AI Safety", "US Infrastructure"],
-        "ceo": "Sam Altman",
-        "stock_impact": "Private company, valued at $260 billion in recent talks",
-        "challenges": [
-            "Competition from open-source models",
-            "Regulatory concerns",
-            "Governance issues",
-        ],
-    },
-    "deepseek": {
-        "name": "DeepSeek",
-        "planned_investment_2025": "Not publicly disclosed",
-        "investment_2024": "Not publicly disclosed",
-        "key_areas": ["R1 Reasoning Model", "Cost-efficient AI"],
-        "ceo": "Not specified",
-        "stock_impact": "Caused Nvidia shares to plunge 17%, erasing $600 billion in one day",
-        "challenges": [
-            "Limited access to advanced Nvidia GPUs",
-            "Competition from established players",
-        ],
-    },
-}
-
-# Define a database of AI investment metrics and trends
-INVESTMENT_METRICS = {
-    "big_tech_combined_2024": "$246 billion",
-    "big_tech_combined_2023": "$151 billion",
-    "projected_big_tech_2025": "$320+ billion",
-    "growth_rate_2023_to_2024": "63%",
-    "magnificent_seven_capex_growth": "40%",
-    "rest_of_sp500_capex_growth": "3.5%",
-    "magnificent_seven_profit_growth": "33%",
-    "rest_of_sp500_profit_growth": "5%",
-}
-
 # Define a database of AI investment analysis reports
 ANALYSIS_REPORTS = {
     "investor_concerns": [
@@ -123,6 +57,83 @@ ANALYSIS_REPORTS = {
     ],
 }
 
+# Define a database of AI-related market events and their impact
+EVENTS = {
+    "deepseek r1 release": {
+        "description": "Release of DeepSeek's R1 reasoning model that claimed similar capabilities to Google and OpenAI at a fraction of the price",
+        "direct_impact": "Caused Nvidia shares to plunge 17%, erasing $600 billion in one day",
+        "indirect_impact": "Exacerbated sell-off in Big Tech stocks, particularly Microsoft and Alphabet",
+        "long_term_implications": "Raised concerns about AI model commoditization and potential compression of profit margins",
+        "expert_opinions": [
+            "Could add to demand by showing how new techniques could make AI cheaper (Pichai)",
+            "Will probably amplify investor concerns in the meantime (Tierney)",
+        ],
+    },
+    "microsoft earnings": {
+        "description": "Microsoft's Q4 2024 earnings report showing weaker than expected cloud growth alongside steep increases in capital spending",
+        "direct_impact": "Microsoft had $200 billion wiped from market value",
+        "indirect_impact": "Raised investor concerns about the return on AI investments",
+        "long_term_implications": "Increased scrutiny on the adoption rate of Microsoft's Copilot agents",
+        "expert_opinions": [
+            "If we see Copilot uptake improve, investors will be more comfortable with spending (Tierney)"
+        ],
+    },
+    "google earnings": {
+        "description": "Google's Q4 2024 earnings report showing 13% growth in ad revenue but opaque metrics about Gemini usage",
+        "direct_impact": "Alphabet's 8% drop was its fifth-worst trading day in the past decade",
+        "indirect_impact": "Raised questions about Google's ability to monetize its AI investments",
+        "long_term_implications": "Increased focus on how Google integrates AI into search without cannibalizing its core ad business",
+        "expert_opinions": [
+            "If there's meant to be cracks in Google's search empire, it certainly isn't showing up yet (Shmulik)"
+        ],
+    },
+    "amazon investment announcement": {
+        "description": "Amazon's announcement of more than $100 billion in capital expenditure for 2025",
+        "direct_impact": "Stock fell as much as 7% in after-hours trading",
+        "indirect_impact": "Set a new benchmark for AI infrastructure investment among Big Tech",
+        "long_term_implications": "Positioned AWS to potentially gain market share in cloud AI services",
+        "expert_opinions": [
+            "Growth is cooking along a little bit, but the appetite to invest hasn't been curtailed (Pearson)",
+            "They are ploughing ahead even if the return on investment seems distant (Pearson)",
+        ],
+    },
+    "meta earnings": {
+        "description": "Meta's earnings report and pledge to spend 'hundreds of billions' more on AI",
+        "direct_impact": "Shares rising despite increased spending plans",
+        "indirect_impact": "Demonstrated that investors can embrace AI spending when ROI is visible",
+        "long_term_implications": "Set Meta apart from peers by showing tangible returns from AI investment",
+        "expert_opinions": [
+            "Investors have embraced Meta because there is a real-time return-on-investment improvement in client spending that is measurable (Tierney)"
+        ],
+    },
+    "openai softbank partnership": {
+        "description": "OpenAI's partnership with SoftBank and Oracle to invest $100 billion in AI-related US infrastructure",
+        "direct_impact": "Talks to invest $25 billion in OpenAI at a $260 billion valuation",
+        "indirect_impact": "Demonstrated continued private investment appetite despite public market concerns",
+        "long_term_implications": "Potential to rise to half a trillion investment over time",
+        "expert_opinions": [
+            "Could there be an AI winter at some point? Sure. But if you're in a position to be a leader, you can't take your foot off the gas (Jaluria)"
+        ],
+    },
+}
+
+
+# Pre-rendered JSON for the static data returned by the tools
+ANALYSIS_JSON = {
+    analysis_type: to_json({analysis_type: analysis})
+    for analysis_type, analysis in ANALYSIS_REPORTS.items()
+}
+EVENTS_JSON = {event: to_json(details) for event, details in EVENTS.items()}
+EVENT_NAMES = ", ".join(EVENTS)
+ANALYSIS_TYPES = ", ".join(ANALYSIS_REPORTS)
+
+# Companies whose stock reacted positively to their AI spending
+POSITIVE_COMPANIES = frozenset(
+    company_id
+    for company_id, company in COMPANY_DATABASE.items()
+    if "Positive" in company["stock_impact"]
+)
+
 
 @tool
 def get_company_info(company_name: str) -> str:
@@ -134,19 +145,13 @@ def get_company_info(company_name: str) -> str:
     Returns:
         Detailed information about the company's AI investments
     """
-    company_name = company_name.lower().strip()
+    company_name = resolve_company_id(company_name)
 
-    # Handle common variations
-    if company_name == "google":
-        company_name = "alphabet"
-    elif company_name == "facebook":
-        company_name = "meta"
-
-    if company_name in COMPANY_DATABASE:
-        company = COMPANY_DATABASE[company_name]
-        return json.dumps(company, indent=2)
+    company_json = COMPANY_JSON.get(company_name)
+    if company_json is not None:
+        return company_json
     else:
-        return f"Company '{company_name}' not found in the database. Available companies: {', '.join(COMPANY_DATABASE.keys())}"
+        return company_not_found(company_name)
 
 
 @tool
@@ -160,45 +165,16 @@ def compare_companies(company1: str, company2: str) -> str:
     Returns:
         Comparison of AI investments between the two companies
     """
-    company1 = company1.lower().strip()
-    company2 = company2.lower().strip()
-
-    # Handle common variations
-    if company1 == "google":
-        company1 = "alphabet"
-    elif company1 == "facebook":
-        company1 = "meta"
-
-    if company2 == "google":
-        company2 = "alphabet"
-    elif company2 == "facebook":
-        company2 = "meta"
-
-    if company1 not in COMPANY_DATABASE:
-        return f"Company '{company1}' not found in the database. Available companies: {', '.join(COMPANY_DATABASE.keys())}"
-
-    if company2 not in COMPANY_DATABASE:
-        return f"Company '{company2}' not found in the database. Available companies: {', '.join(COMPANY_DATABASE.keys())}"
-
-    comp1 = COMPANY_DATABASE[company1]
-    comp2 = COMPANY_DATABASE[company2]
-
-    comparison = {
-        "comparison": {
-            "name": [comp1["name"], comp2["name"]],
-            "planned_investment_2025": [
-                comp1["planned_investment_2025"],
-                comp2["planned_investment_2025"],
-            ],
-            "investment_2024": [comp1["investment_2024"], comp2["investment_2024"]],
-            "key_areas": [comp1["key_areas"], comp2["key_areas"]],
-            "ceo": [comp1["ceo"], comp2["ceo"]],
-            "stock_impact": [comp1["stock_impact"], comp2["stock_impact"]],
-            "challenges": [comp1["challenges"], comp2["challenges"]],
-        }
-    }
+    company1 = resolve_company_id(company1)
+    company2 = resolve_company_id(company2)
+
+    if company1 not in COMPANY_IDS:
+        return company_not_found(company1)
 
-    return json.dumps(comparison, indent=2)
+    if company2 not in COMPANY_IDS:
+        return company_not_found(company2)
+
+    return build_comparison_json(company1, company2)
 
 
 @tool
@@ -208,7 +184,7 @@ def get_investment_metrics() -> str:
     Returns:
         Overall metrics and trends in Big Tech AI investments
     """
-    return json.dumps(INVESTMENT_METRICS, indent=2)
+    return INVESTMENT_METRICS_JSON
 
 
 @tool
@@ -221,90 +197,93 @@ def get_investment_analysis(analysis_type: str) -> str:
     Returns:
         Analysis about Big Tech AI investments
     """
-    analysis_type = analysis_type.lower().strip()
+    analysis_json = ANALYSIS_JSON.get(analysis_type)
+    if analysis_json is None:
+        analysis_type = normalize_name(analysis_type)
+        analysis_json = ANALYSIS_JSON.get(analysis_type)
 
-    if analysis_type in ANALYSIS_REPORTS:
-        return json.dumps({analysis_type: ANALYSIS_REPORTS[analysis_type]}, indent=2)
+    if analysis_json is not None:
+        return analysis_json
     else:
-        return f"Analysis type '{analysis_type}' not found. Available types: {', '.join(ANALYSIS_REPORTS.keys())}"
-
+        return f"Analysis type '{analysis_type}' not found. Available types: {ANALYSIS_TYPES}"
 
-@tool
-def search_content_by_keyword(keyword: str) -> str:
-    """Search the content database for information related to a keyword.
 
-    Args:
-        keyword: The keyword to search for
-
-    Returns:
-        Information related to the keyword from the content database
-    """
-    # Set up a knowledge base for searching
-    knowledge_base = TextKnowledgeBase(
-        path="content_data",  # Use the content_data directory which contains content.txt
-        vector_db=LanceDb(
-            table_name="embeddings_dynamic_planner",
-            uri="lancedb_data",  # Use lancedb_data directory for database storage
-        ),
-        embedder=OpenAIEmbedder(
-            id=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-        ),
-    )
+@lru_cache(maxsize=512)
+def search_content(keyword):
+    """Search the knowledge base for a normalized keyword and render the results"""
+    # Reuse the agent's knowledge base so the LanceDB table stays open
+    knowledge_base = setup_knowledge_base()
 
-    # Search for the keyword
-    results = knowledge_base.search(keyword, limit=3)
+    # Rank only the entries that mention the keyword, and fall back to a plain
+    # semantic search when none do
+    results = keyword_search(knowledge_base.vector_db, keyword, limit=3)
+    if not results:
+        results = [result.content for result in knowledge_base.search(keyword, limit=3)]
 
     if results:
-        return json.dumps({"results": [result.content for result in results]}, indent=2)
+        return to_json({"results": results})
     else:
         return f"No information found for keyword '{keyword}'."
 
 
 @tool
-def generate_investment_recommendation(
-    company_name: str, investment_amount: float
-) -> str:
-    """Generate a recommendation for investing in a Big Tech company's AI initiatives.
+def search_content_by_keyword(keyword: str) -> str:
+    """Search the content database for information related to a keyword.
 
     Args:
-        company_name: The name of the company to analyze
-        investment_amount: The amount to potentially invest (in USD)
+        keyword: The keyword to search for
 
     Returns:
-        Investment recommendation with pros and cons
+        Information related to the keyword from the content database
     """
-    company_name = company_name.lower().strip()
+    # Repeated searches for the same keyword are served from the cache
+    return search_content(" ".join(keyword.casefold().split()))
 
-    # Handle common variations
-    if company_name == "google":
-        company_name = "alphabet"
-    elif company_name == "facebook":
-        company_name = "meta"
 
-    if company_name not in COMPANY_DATABASE:
-        return f"Company '{company_name}' not found in the database. Available companies: {', '.join(COMPANY_DATABASE.keys())}"
-
-    company = COMPANY_DATABASE[company_name]
+@lru_cache(maxsize=512)
+def build_recommendation_json(company_id, investment_amount):
+    """Build the JSON investment recommendation for a company ID and amount"""
+    company = COMPANY_DATABASE[company_id]
+    positive = company_id in POSITIVE_COMPANIES
 
     # Generate a recommendation based on the company's profile
     recommendation = {
         "company": company["name"],
         "investment_amount": f"${investment_amount:,.2f}",
-        "recommendation": (
-            "Positive" if "Positive" in company["stock_impact"] else "Cautious"
-        ),
+        "recommendation": "Positive" if positive else "Cautious",
         "pros": [
             f"Significant AI investment planned for 2025: {company['planned_investment_2025']}",
             f"Focus on key AI areas: {', '.join(company['key_areas'])}",
             f"Strong leadership under CEO {company['ceo']}",
         ],
         "cons": company["challenges"],
-        "risk_level": "Medium" if "Positive" in company["stock_impact"] else "High",
+        "risk_level": "Medium" if positive else "High",
         "potential_return": "High but long-term",
         "alternative_considerations": "Consider diversifying AI investments across multiple Big Tech companies",
     }
 
-    return json.dumps(recommendation, indent=2)
+    return to_json(recommendation)
+
+
+@tool
+def generate_investment_recommendation(
+    company_name: str, investment_amount: float
+) -> str:
+    """Generate a recommendation for investing in a Big Tech company's AI initiatives.
+
+    Args:
+        company_name: The name of the company to analyze
+        investment_amount: The amount to potentially invest (in USD)
+
+    Returns:
+        Investment recommendation with pros and cons
+    """
+    company_name = resolve_company_id(company_name)
+
+    if company_name not in COMPANY_DATABASE:
+        return company_not_found(company_name)
+
+    return build_recommendation_json(company_name, investment_amount)
 
 
 @tool
@@ -317,84 +296,34 @@ def analyze_market_impact(event: str) -> str:
     Returns:
         Analysis of the market impact
     """
-    events = {
-        "deepseek r1 release": {
-            "description": "Release of DeepSeek's R1 reasoning model that claimed similar capabilities to Google and OpenAI at a fraction of the price",
-            "direct_impact": "Caused Nvidia shares to plunge 17%, erasing $600 billion in one day",
-            "indirect_impact": "Exacerbated sell-off in Big Tech stocks, particularly Microsoft and Alphabet",
-            "long_term_implications": "Raised concerns about AI model commoditization and potential compression of profit margins",
-            "expert_opinions": [
-                "Could add to demand by showing how new techniques could make AI cheaper (Pichai)",
-                "Will probably amplify investor concerns in the meantime (Tierney)",
-            ],
-        },
-        "microsoft earnings": {
-            "description": "Microsoft's Q4 2024 earnings report showing weaker than expected cloud growth alongside steep increases in capital spending",
-            "direct_impact": "Microsoft had $200 billion wiped from market value",
-            "indirect_impact": "Raised investor concerns about the return on AI investments",
-            "long_term_implications": "Increased scrutiny on the adoption rate of Microsoft's Copilot agents",
-            "expert_opinions": [
-                "If we see Copilot uptake improve, investors will be more comfortable with spending (Tierney)"
-            ],
-        },
-        "google earnings": {
-            "description": "Google's Q4 2024 earnings report showing 13% growth in ad revenue but opaque metrics about Gemini usage",
-            "direct_impact": "Alphabet's 8% drop was its fifth-worst trading day in the past decade",
-            "indirect_impact": "Raised questions about Google's ability to monetize its AI investments",
-            "long_term_implications": "Increased focus on how Google integrates AI into search without cannibalizing its core ad business",
-            "expert_opinions": [
-                "If there's meant to be cracks in Google's search empire, it certainly isn't showing up yet (Shmulik)"
-            ],
-        },
-        "amazon investment announcement": {
-            "description": "Amazon's announcement of more than $100 billion in capital expenditure for 2025",
-            "direct_impact": "Stock fell as much as 7% in after-hours trading",
-            "indirect_impact": "Set a new benchmark for AI infrastructure investment among Big Tech",
-            "long_term_implications": "Positioned AWS to potentially gain market share in cloud AI services",
-            "expert_opinions": [
-                "Growth is cooking along a little bit, but the appetite to invest hasn't been curtailed (Pearson)",
-                "They are ploughing ahead even if the return on investment seems distant (Pearson)",
-            ],
-        },
-        "meta earnings": {
-            "description": "Meta's earnings report and pledge to spend 'hundreds of billions' more on AI",
-            "direct_impact": "Shares rising despite increased spending plans",
-            "indirect_impact": "Demonstrated that investors can embrace AI spending when ROI is visible",
-            "long_term_implications": "Set Meta apart from peers by showing tangible returns from AI investment",
-            "expert_opinions": [
-                "Investors have embraced Meta because there is a real-time return-on-investment improvement in client spending that is measurable (Tierney)"
-            ],
-        },
-        "openai softbank partnership": {
-            "description": "OpenAI's partnership with SoftBank and Oracle to invest $100 billion in AI-related US infrastructure",
-            "direct_impact": "Talks to invest $25 billion in OpenAI at a $260 billion valuation",
-            "indirect_impact": "Demonstrated continued private investment appetite despite public market concerns",
-            "long_term_implications": "Potential to rise to half a trillion investment over time",
-            "expert_opinions": [
-                "Could there be an AI winter at some point? Sure. But if you're in a position to be a leader, you can't take your foot off the gas (Jaluria)"
-            ],
-        },
-    }
-
-    event = event.lower().strip()
+    event_json = EVENTS_JSON.get(event)
+    if event_json is None:
+        event = normalize_name(event)
+        event_json = EVENTS_JSON.get(event)
 
-    if event in events:
-        return json.dumps(events[event], indent=2)
+    if event_json is not None:
+        return event_json
     else:
-        return f"Event '{event}' not found in the database. Available events: {', '.join(events.keys())}"
+        return f"Event '{event}' not found in the database. Available events: {EVENT_NAMES}"
 
 
+@lru_cache(maxsize=1)
 def setup_knowledge_base():
-    """Set up a knowledge base using LanceDB and the content from content_data/content.txt"""
+    """Set up a knowledge base using LanceDB and the content from content_data/content.txt
+
+    The knowledge base is created once and shared by the agent and the search tool.
+    """
     # Create the knowledge base with LanceDB as the vector database
     knowledge_base = TextKnowledgeBase(
         path="content_data",  # Use the content_data directory which contains content.txt
         vector_db=LanceDb(
             table_name="embeddings_dynamic_planner",
             uri="lancedb_data",  # Use lancedb_data directory for database storage
-        ),
-        embedder=OpenAIEmbedder(
-            id=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+            # Only used once the table is large enough to get an index
+            nprobes=SEARCH_NPROBES,
+            # Use unit-length OpenAI embeddings, so L2 distance ranks like cosine
+            embedder=get_embedder(),
+            distance=Distance.l2,
         ),
     )
 
@@ -446,9 +375,13 @@ def create_dynamic_planner_agent(knowledge_base):
     return agent
 
 
-def main():
+async def main():
+    # Let arrow keys recall questions from earlier runs
+    enable_input_history()
     print("Creating a Dynamic Planner Agent for AI Investment Analysis...")
     knowledge_base = setup_knowledge_base()
+    # Index the table once it has grown past the point where a flat scan is fine
+    ensure_vector_index(knowledge_base.vector_db)
     agent = create_dynamic_planner_agent(knowledge_base)
 
     print("\n=== Dynamic Planner Agent for AI Investment Analysis ===")
@@ -469,9 +402,10 @@ def main():
             break
 
         print(f"\nProcessing request: '{request}'...")
-        # Use the agent to process the request
-        agent.print_response(request, stream=True)
+        # Use the agent to process the request. The async path runs the tool
+        # calls of a planned step concurrently.
+        await agent.aprint_response(request, stream=True)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,48 +1,73 @@
 import os
-from dotenv import load_dotenv
+import asyncio
+from functools import lru_cache
+from bootstrap import enable_input_history, load_environment
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools.reasoning import ReasoningTools
+from agno.document import Document
 from agno.knowledge.text import TextKnowledgeBase
 from agno.vectordb.lancedb import LanceDb
-from agno.embedder.openai import OpenAIEmbedder
+from agno.vectordb.distance import Distance
+from kb_common import (
+    SEARCH_NPROBES,
+    ensure_vector_index,
+    get_embedder,
+    knowledge_base_is_loaded,
+    load_in_batches,
+)
 
 # Load environment variables
-load_dotenv()
+load_environment()
 
 completion_model = os.getenv("COMPLETION_MODEL", "gpt-4.1-mini")
 
 
 def load_content():
     """Load content from content_data/content.txt, where each line is a separate text entry"""
-    with open("content_data/content.txt", "r") as f:
-        return [line.strip() for line in f if line.strip()]
+    with open("content_data/content.txt", "rb") as f:
+        data = f.read()
 
+    # Split and strip the raw bytes, then decode only the non-empty entries
+    return [line.decode() for line in map(bytes.strip, data.splitlines()) if line]
 
+
+@lru_cache(maxsize=1)
 def setup_knowledge_base():
-    """Set up a knowledge base using LanceDB and the content from content_data/content.txt"""
+    """Set up a knowledge base using LanceDB and the content from content_data/content.txt
+
+    The knowledge base is created once, so the LanceDB table and embedder stay open.
+    """
     # Create the knowledge base with LanceDB as the vector database
     knowledge_base = TextKnowledgeBase(
         path="content_data",  # Use the content_data directory which contains only content.txt
         vector_db=LanceDb(
             table_name="embeddings",
             uri="lancedb_data",
-            # Use OpenAI embeddings
-            embedder=OpenAIEmbedder(
-                id=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-            ),
+            # Only used once the table is large enough to get an index
+            nprobes=SEARCH_NPROBES,
+            # Use unit-length OpenAI embeddings, so L2 distance ranks like cosine
+            embedder=get_embedder(),
+            distance=Distance.l2,
         ),
     )
 
     return knowledge_base
 
 
-def ask_question(question):
-    """Ask a question using the Agno agent with RAG"""
-    # Set up the knowledge base
-    knowledge_base = setup_knowledge_base()
+def load_knowledge_base(knowledge_base):
+    """Load content.txt into the knowledge base, embedding its entries in batches"""
+    documents = [
+        Document(name="content", content=line, meta_data={"line": number})
+        for number, line in enumerate(load_content(), start=1)
+    ]
+
+    # Replaces the table's rows and records the loaded content hash
+    load_in_batches(knowledge_base, [documents])
+
 
-    # Set up the agent
+def create_rag_agent(knowledge_base):
+    """Create the Agno agent that answers questions with RAG"""
     agent = Agent(
         model=OpenAIChat(id=completion_model),
         knowledge=knowledge_base,
@@ -60,23 +85,36 @@ def ask_question(question):
         show_tool_calls=True,
     )
 
-    # Use the agent to answer the question
-    agent.print_response(question, stream=True)
+    return agent
 
 
-def main():
+async def ask_question(agent, question):
+    """Ask a question using the Agno agent with RAG"""
+    # The async path runs the knowledge base searches of a model turn concurrently
+    await agent.aprint_response(question, stream=True)
+
+
+async def main():
+    # Let arrow keys recall questions from earlier runs
+    enable_input_history()
     print("Setting up knowledge base...")
     knowledge_base = setup_knowledge_base()
 
     # Check if we need to load the knowledge base
-    # If the vector database already exists, we can skip this step
-    if not os.path.exists("lancedb_data/embeddings"):
+    # If the table already holds the content, we can skip this step
+    if not knowledge_base_is_loaded(knowledge_base):
         print("Loading knowledge base...")
-        knowledge_base.load(upsert=True)
+        load_knowledge_base(knowledge_base)
         print("Knowledge base loaded successfully!")
     else:
         print("Using existing knowledge base.")
 
+    # Index the table once it has grown past the point where a flat scan is fine
+    ensure_vector_index(knowledge_base.vector_db)
+
+    # Set up the agent once and reuse it for every question
+    agent = create_rag_agent(knowledge_base)
+
     # Example usage of question answering
     while True:
         question = input("\nEnter your question (or 'quit' to exit): ")
@@ -87,12 +125,13 @@ def main():
         # Use the agent to answer the question
         if question.lower() in ["summarize", "summary"]:
             # For summarize questions, provide more context
-            ask_question(
-                "Summarize the information about Big Tech's AI investments and spending"
+            await ask_question(
+                agent,
+                "Summarize the information about Big Tech's AI investments and spending",
             )
         else:
-            ask_question(question)
+            await ask_question(agent, question)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,19 +1,23 @@
 import os
-import json
-from dotenv import load_dotenv
+import orjson
+from functools import lru_cache
+from bootstrap import enable_input_history, load_environment
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools.reasoning import ReasoningTools
-from agno.knowledge.text import TextKnowledgeBase
-from agno.vectordb.lancedb import LanceDb
-from agno.embedder.openai import OpenAIEmbedder
 from agno.tools import FunctionCall, tool
 from agno.exceptions import StopAgentRun
 from rich.console import Console
 from rich.prompt import Prompt
+from kb_common import (
+    ensure_vector_index,
+    knowledge_base_is_loaded,
+    load_in_batches,
+    setup_shared_knowledge_base,
+)
 
 # Load environment variables
-load_dotenv()
+load_environment()
 
 # Create a console for rich output
 console = Console()
@@ -21,30 +25,6 @@ console = Console()
 completion_model = os.getenv("COMPLETION_MODEL", "gpt-4.1-mini")
 
 
-def load_content():
-    """Load content from content_data/content.txt, where each line is a separate text entry"""
-    with open("content_data/content.txt", "r") as f:
-        return [line.strip() for line in f if line.strip()]
-
-
-def setup_knowledge_base():
-    """Set up a knowledge base using LanceDB and the content from content_data/content.txt"""
-    # Create the knowledge base with LanceDB as the vector database
-    knowledge_base = TextKnowledgeBase(
-        path="content_data",  # Use the content_data directory which contains content.txt
-        vector_db=LanceDb(
-            table_name="embeddings_human_loop",
-            uri="lancedb_data",
-            # Use OpenAI embeddings
-            embedder=OpenAIEmbedder(
-                id=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-            ),
-        ),
-    )
-
-    return knowledge_base
-
-
 def human_confirmation_hook(fc: FunctionCall):
     """Pre-hook for tool calls to get human confirmation"""
     # Get the live display instance from the console
@@ -56,7 +36,8 @@ def human_confirmation_hook(fc: FunctionCall):
 
     # Ask for confirmation
     console.print(f"\n[bold blue]AI wants to perform: {fc.function.name}[/]")
-    console.print(f"[bold green]Parameters:[/] {json.dumps(fc.arguments, indent=2)}")
+    arguments = orjson.dumps(fc.arguments, option=orjson.OPT_INDENT_2).decode()
+    console.print(f"[bold green]Parameters:[/] {arguments}")
     message = (
         Prompt.ask("Do you want to allow this action?", choices=["y", "n"], default="y")
         .strip()
@@ -103,17 +84,9 @@ def get_human_input(question: str) -> str:
     return response
 
 
-@tool(pre_hook=human_confirmation_hook)
-def analyze_investment_data(company: str, investment_amount: str) -> str:
-    """Analyze investment data for a specific company.
-
-    Args:
-        company (str): The name of the company to analyze
-        investment_amount (str): The investment amount to analyze
-
-    Returns:
-        str: Analysis of the investment data
-    """
+@lru_cache(maxsize=256)
+def build_investment_analysis_json(company, investment_amount):
+    """Build the JSON investment analysis for a company and amount"""
     # This is a mock function that would normally do some real analysis
     # For demo purposes, we'll just return some mock data
     analysis = {
@@ -125,7 +98,22 @@ def analyze_investment_data(company: str, investment_amount: str) -> str:
         "competitive_analysis": "Leading position against similar investments from competitors",
     }
 
-    return json.dumps(analysis, indent=2)
+    # Compact JSON, since the model doesn't need indentation
+    return orjson.dumps(analysis).decode()
+
+
+@tool(pre_hook=human_confirmation_hook)
+def analyze_investment_data(company: str, investment_amount: str) -> str:
+    """Analyze investment data for a specific company.
+
+    Args:
+        company (str): The name of the company to analyze
+        investment_amount (str): The investment amount to analyze
+
+    Returns:
+        str: Analysis of the investment data
+    """
+    return build_investment_analysis_json(company, investment_amount)
 
 
 def setup_agent_with_human_loop(knowledge_base):
@@ -157,18 +145,23 @@ def setup_agent_with_human_loop(knowledge_base):
 
 
 def main():
+    # Let arrow keys recall questions from earlier runs
+    enable_input_history()
     print("Setting up knowledge base...")
-    knowledge_base = setup_knowledge_base()
+    knowledge_base = setup_shared_knowledge_base()
 
     # Check if we need to load the knowledge base
-    # If the vector database already exists, we can skip this step
-    if not os.path.exists("lancedb_data/embeddings_human_loop"):
+    # If the shared table already holds the content, we can skip this step
+    if not knowledge_base_is_loaded(knowledge_base):
         print("Loading knowledge base...")
-        knowledge_base.load(upsert=True)
+        load_in_batches(knowledge_base)
         print("Knowledge base loaded successfully!")
     else:
         print("Using existing knowledge base.")
 
+    # Index the table once it has grown past the point where a flat scan is fine
+    ensure_vector_index(knowledge_base.vector_db)
+
     # Set up the agent with human-in-the-loop capability
     print("Setting up Agno agent with human-in-the-loop capability...")
     agent = setup_agent_with_human_loop(knowledge_base)
@@ -194,7 +187,9 @@ def main():
             break
 
         print("\nFinding answer...")
-        # Use the agent to answer the question with potential human interaction
+        # Use the agent to answer the question with potential human interaction.
+        # The sync path runs tool calls one at a time, so the confirmation and
+        # input prompts never compete for stdin or the live display.
         agent.print_response(question, stream=True, console=console)
 
 
@@ -1,35 +1,34 @@
 import os
-from dotenv import load_dotenv
+import asyncio
+import httpx
+from bootstrap import enable_input_history, load_environment
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools.reasoning import ReasoningTools
 from agno.team.team import Team
-from agno.knowledge.text import TextKnowledgeBase
-from agno.vectordb.lancedb import LanceDb
-from agno.embedder.openai import OpenAIEmbedder
+from kb_common import (
+    ensure_vector_index,
+    knowledge_base_is_loaded,
+    load_in_batches,
+    setup_shared_knowledge_base,
+)
+from semantic_cache import SemanticCache
 
 # Load environment variables
-load_dotenv()
+load_environment()
 
 completion_model = os.getenv("COMPLETION_MODEL", "gpt-4.1-mini")
 
+# The OpenAI SDK's 600s default read timeout, so long completions aren't cut
+# off, with a short connect timeout
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
 
-def setup_knowledge_base():
-    """Set up a knowledge base using LanceDB and the content from content_data/content.txt"""
-    # Create the knowledge base with LanceDB as the vector database
-    knowledge_base = TextKnowledgeBase(
-        path="content_data",  # Use the content_data directory which contains content.txt
-        vector_db=LanceDb(
-            table_name="embeddings_team",
-            uri="lancedb_data",
-            # Use OpenAI embeddings
-            embedder=OpenAIEmbedder(
-                id=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-            ),
-        ),
-    )
-
-    return knowledge_base
+# One HTTP/2 connection pool for the coordinator and all members. The team runs
+# through the async path, so the models get an async client.
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+async_http_client = httpx.AsyncClient(
+    http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT
+)
 
 
 def create_investment_analysis_team(knowledge_base):
@@ -38,7 +37,7 @@ def create_investment_analysis_team(knowledge_base):
     # Financial Analyst Agent
     financial_analyst = Agent(
         name="Financial Analyst",
-        model=OpenAIChat(id=completion_model),
+        model=OpenAIChat(id=completion_model, http_client=async_http_client),
         knowledge=knowledge_base,
         search_knowledge=True,
         tools=[ReasoningTools()],
@@ -55,7 +54,7 @@ def create_investment_analysis_team(knowledge_base):
     # Technology Analyst Agent
     technology_analyst = Agent(
         name="Technology Analyst",
-        model=OpenAIChat(id=completion_model),
+        model=OpenAIChat(id=completion_model, http_client=async_http_client),
         knowledge=knowledge_base,
         search_knowledge=True,
         tools=[ReasoningTools()],
@@ -72,7 +71,7 @@ def create_investment_analysis_team(knowledge_base):
     # Market Analyst Agent
     market_analyst = Agent(
         name="Market Analyst",
-        model=OpenAIChat(id=completion_model),
+        model=OpenAIChat(id=completion_model, http_client=async_http_client),
         knowledge=knowledge_base,
         search_knowledge=True,
         tools=[ReasoningTools()],
@@ -89,7 +88,7 @@ def create_investment_analysis_team(knowledge_base):
     # Executive Summary Agent
     executive_summary = Agent(
         name="Executive Summary",
-        model=OpenAIChat(id=completion_model),
+        model=OpenAIChat(id=completion_model, http_client=async_http_client),
         knowledge=knowledge_base,
         search_knowledge=True,
         tools=[ReasoningTools()],
@@ -107,7 +106,7 @@ def create_investment_analysis_team(knowledge_base):
     investment_team = Team(
         name="AI Investment Analysis Team",
         mode="coordinate",  # Coordinator delegates tasks and synthesizes responses
-        model=OpenAIChat(id=completion_model),
+        model=OpenAIChat(id=completion_model, http_client=async_http_client),
         members=[
             financial_analyst,
             technology_analyst,
@@ -126,6 +125,7 @@ def create_investment_analysis_team(knowledge_base):
             "Based on the user's question, determine which team members should contribute to the analysis.",
             "Synthesize the team members' responses into a comprehensive, well-structured analysis.",
             "For general questions, involve all team members to provide a holistic view.",
+            "Delegate to independent team members in the same step so they can work in parallel.",
             "For specific questions, focus on the most relevant team members.",
             "Always ensure the final response is well-organized with clear sections.",
         ],
@@ -135,23 +135,31 @@ def create_investment_analysis_team(knowledge_base):
     return investment_team
 
 
-def main():
+async def main():
+    # Let arrow keys recall questions from earlier runs
+    enable_input_history()
     print("Setting up knowledge base...")
-    knowledge_base = setup_knowledge_base()
+    knowledge_base = setup_shared_knowledge_base()
 
     # Check if we need to load the knowledge base
-    # If the vector database already exists, we can skip this step
-    if not os.path.exists("lancedb_data/embeddings_team"):
+    # If the shared table already holds the content, we can skip this step
+    if not knowledge_base_is_loaded(knowledge_base):
         print("Loading knowledge base...")
-        knowledge_base.load(upsert=True)
+        load_in_batches(knowledge_base)
         print("Knowledge base loaded successfully!")
     else:
         print("Using existing knowledge base.")
 
+    # Index the table once it has grown past the point where a flat scan is fine
+    ensure_vector_index(knowledge_base.vector_db)
+
     # Create the investment analysis team
     print("Creating AI Investment Analysis Team...")
     investment_team = create_investment_analysis_team(knowledge_base)
 
+    # Analyses of earlier questions, reused for questions that mean the same thing
+    answer_cache = SemanticCache("semantic_cache_team", knowledge_base)
+
     print("\n=== Agno Team Demo ===")
     print(
         "This demo shows how a team of specialized agents can work together to analyze Big Tech AI investments."
@@ -179,14 +187,28 @@ def main():
 
     # Run the team
     while True:
-        question = input("\nEnter your question (or 'quit' to exit): ")
+        # Wait for input in a worker thread so the event loop stays free
+        question = await asyncio.to_thread(
+            input, "\nEnter your question (or 'quit' to exit): "
+        )
         if question.lower() == "quit":
             break
 
         print(f"\nAnalyzing: '{question}'...")
-        # Use the team to answer the question
-        investment_team.print_response(question, stream=True)
+        embedding = answer_cache.embed(question)
+        cached_answer = answer_cache.lookup(question, embedding)
+        if cached_answer is not None:
+            print("(Analysis of a similar earlier question)")
+            print(cached_answer)
+            continue
+
+        # Use the team to answer the question. The async path runs the member
+        # tasks the coordinator delegates in one step concurrently.
+        await investment_team.aprint_response(question, stream=True)
+        run_response = investment_team.run_response
+        if run_response and run_response.content:
+            answer_cache.add(question, embedding, run_response.content)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
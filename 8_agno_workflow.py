@@ -1,21 +1,117 @@
 import os
+import asyncio
+import hashlib
+import sqlite3
+import time
+import httpx
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict, Iterator, Optional
-from dotenv import load_dotenv
+import numpy as np
+import orjson
+from bootstrap import enable_input_history, load_environment
+from pydantic import BaseModel, Field
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools.reasoning import ReasoningTools
-from agno.knowledge.text import TextKnowledgeBase
-from agno.vectordb.lancedb import LanceDb
-from agno.embedder.openai import OpenAIEmbedder
 from agno.workflow import Workflow, RunResponse, RunEvent
 from agno.storage.sqlite import SqliteStorage
 from agno.utils.log import logger
+from kb_common import (
+    content_hash,
+    ensure_vector_index,
+    get_embedder,
+    knowledge_base_is_loaded,
+    load_in_batches,
+    search_many,
+    setup_shared_knowledge_base,
+)
+from semantic_cache import SEMANTIC_CACHE_TTL, literal_terms
 
 # Load environment variables
-load_dotenv()
+load_environment()
 
 completion_model = os.getenv("COMPLETION_MODEL", "gpt-4.1-mini")
 
+# The OpenAI SDK's 600s default read timeout, so long completions aren't cut
+# off, with a short connect timeout
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+# One HTTP/2 connection pool for the agents that run through the sync path
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+http_client = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+# Aspects of a topic that are researched in parallel
+RESEARCH_FACETS = (
+    "spending figures and investment plans",
+    "risks and challenges",
+    "competitive positioning",
+)
+
+# Maximum number of research runs sent to OpenAI at the same time
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+
+# Minimum cosine similarity for a topic to reuse the results of a cached topic.
+# Like the semantic cache, results are only reused for the same knowledge base
+# content, within a TTL, and when the figures and names in both topics match.
+TOPIC_SIMILARITY_THRESHOLD = 0.9
+
+
+# SQLite database holding the workflow sessions and the topic cache
+WORKFLOW_DB_FILE = "sqlite_data/agno_workflows.db"
+
+# Directory the research, analysis and summary of each topic are written to
+REPORTS_DIR = "sqlite_data/reports"
+
+CREATE_TOPIC_CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS topic_cache (
+    hash TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    model TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    results TEXT NOT NULL,
+    scale REAL NOT NULL,
+    terms TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+@lru_cache(maxsize=256)
+def embed_topic(topic):
+    """Embed a topic as a unit-length vector, once per topic"""
+    return get_embedder().get_embedding(topic)
+
+
+def topic_hash(topic):
+    """Key a topic in the topic cache"""
+    return hashlib.sha256(topic.encode()).hexdigest()
+
+
+def quantize_embedding(embedding):
+    """Quantize an embedding to int8 bytes and the scale that restores it"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.abs(vector).max()) / 127 or 1.0
+    return np.round(vector / scale).astype(np.int8).tobytes(), scale
+
+
+@lru_cache(maxsize=1)
+def get_topic_cache_connection():
+    """Open the topic cache table, which outlives the per-topic workflow sessions"""
+    os.makedirs("sqlite_data", exist_ok=True)
+    conn = sqlite3.connect(WORKFLOW_DB_FILE)
+    conn.execute(CREATE_TOPIC_CACHE_SQL)
+    conn.commit()
+    return conn
+
+
+class AnalysisReport(BaseModel):
+    """Analysis of the research findings together with its executive summary"""
+
+    analysis: str = Field(..., description="Structured analysis with clear sections")
+    summary: str = Field(..., description="Executive summary under 250 words")
+
 
 class AIInvestmentWorkflow(Workflow):
     """Workflow for analyzing Big Tech AI investments using multiple specialized agents"""
@@ -29,47 +125,35 @@ class AIInvestmentWorkflow(Workflow):
     # Research Agent: Handles information gathering from the knowledge base
     research_agent: Agent = None
 
-    # Analysis Agent: Analyzes the research findings
+    # Analysis Agent: Analyzes the research findings and summarizes them for executives
     analysis_agent: Agent = None
 
-    # Summary Agent: Creates executive summaries
-    summary_agent: Agent = None
-
     def __init__(self, session_id: str = None, **kwargs):
         super().__init__(session_id=session_id, **kwargs)
 
-        # Set up knowledge base
-        self.knowledge_base = self._setup_knowledge_base()
+        # Use the knowledge base shared with the other content.txt demos
+        self.knowledge_base = setup_shared_knowledge_base()
+        # Cached results are only reused for the content they were researched from
+        self.content_hash = content_hash(self.knowledge_base.path)
+
+        # Create the reports directory once instead of for every topic
+        os.makedirs(REPORTS_DIR, exist_ok=True)
 
         # Initialize agents
         self.research_agent = self._create_research_agent()
         self.analysis_agent = self._create_analysis_agent()
-        self.summary_agent = self._create_summary_agent()
 
         # Check if we need to load the knowledge base
-        # If the vector database already exists, we can skip this step
-        if not os.path.exists("sqlite_data/embeddings_workflow"):
+        # If the shared table already holds the content, we can skip this step
+        if not knowledge_base_is_loaded(self.knowledge_base):
             logger.info("Loading knowledge base...")
-            self.knowledge_base.load(upsert=True)
+            load_in_batches(self.knowledge_base)
             logger.info("Knowledge base loaded successfully!")
         else:
             logger.info("Using existing knowledge base.")
 
-    def _setup_knowledge_base(self):
-        """Set up a knowledge base using LanceDB and the content from content_data/content.txt"""
-        # Create the knowledge base with LanceDB as the vector database
-        knowledge_base = TextKnowledgeBase(
-            path="content_data",  # Use the content_data directory which contains content.txt
-            vector_db=LanceDb(
-                table_name="embeddings_workflow",
-                uri="sqlite_data",  # Use sqlite_data directory for database storage
-                # Use OpenAI embeddings
-                embedder=OpenAIEmbedder(
-                    id=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-                ),
-            ),
-        )
-        return knowledge_base
+        # Index the table once it has grown past the point where a flat scan is fine
+        ensure_vector_index(self.knowledge_base.vector_db)
 
     def _create_research_agent(self):
         """Create an agent for researching information from the knowledge base"""
@@ -90,48 +174,136 @@ class AIInvestmentWorkflow(Workflow):
         )
 
     def _create_analysis_agent(self):
-        """Create an agent for analyzing the research findings"""
+        """Create an agent that analyzes the research findings and writes the executive summary"""
         return Agent(
             name="Analysis Agent",
-            model=OpenAIChat(id=completion_model),
+            model=OpenAIChat(id=completion_model, http_client=http_client),
             tools=[ReasoningTools()],
             instructions=[
-                "You are a financial analyst specialized in tech investments.",
-                "Your job is to analyze the research findings provided to you.",
-                "Identify patterns, risks, opportunities, and implications of the AI investments.",
+                "You are a financial analyst specialized in tech investments and an executive communication specialist.",
+                "Your job is to analyze the research findings provided to you, then summarize them for executives.",
+                "In the analysis, identify patterns, risks, opportunities, and implications of the AI investments.",
                 "Consider market trends, competitive positioning, and potential ROI.",
                 "Provide a structured analysis with clear sections.",
-            ],
-            markdown=True,
-        )
-
-    def _create_summary_agent(self):
-        """Create an agent for creating an executive summary"""
-        return Agent(
-            name="Summary Agent",
-            model=OpenAIChat(id=completion_model),
-            tools=[ReasoningTools()],
-            instructions=[
-                "You are an executive communication specialist.",
-                "Your job is to create a concise executive summary based on research and analysis.",
-                "Focus on the most important points that executives need to know.",
-                "Use clear, direct language and avoid technical jargon.",
+                "In the summary, focus on the most important points that executives need to know.",
+                "Use clear, direct language and avoid technical jargon in the summary.",
                 "Keep the summary under 250 words.",
-                "Include a brief introduction, key findings, and implications.",
+                "Include a brief introduction, key findings, and implications in the summary.",
             ],
+            response_model=AnalysisReport,
             markdown=True,
         )
 
     def get_cached_results(self, topic: str) -> Optional[Dict]:
-        """Get cached results for a topic if they exist"""
+        """Get cached results for a topic, or for a cached topic that means the same thing"""
         logger.info(f"Checking if cached results exist for topic: {topic}")
-        return self.session_state.get("results", {}).get(topic)
+        conn = get_topic_cache_connection()
+        current = (self.content_hash, time.time() - SEMANTIC_CACHE_TTL)
+        row = conn.execute(
+            "SELECT results FROM topic_cache"
+            " WHERE hash = ? AND content_hash = ? AND created_at >= ?",
+            (topic_hash(topic), *current),
+        ).fetchone()
+        if row:
+            return orjson.loads(row[0])
+
+        # Load the current embeddings of topics with the same figures and names
+        rows = conn.execute(
+            "SELECT hash, topic, embedding, scale FROM topic_cache"
+            " WHERE model = ? AND terms = ? AND content_hash = ? AND created_at >= ?",
+            (get_embedder().id, literal_terms(topic), *current),
+        ).fetchall()
+        if not rows:
+            return None
+
+        # The embeddings are unit length, so dot products are cosine similarities.
+        # Stored vectors are int8, so each product is rescaled by its row's scale.
+        embeddings = np.frombuffer(
+            b"".join(row[2] for row in rows), dtype=np.int8
+        ).reshape(len(rows), -1)
+        scales = np.array([row[3] for row in rows], dtype=np.float32)
+        query = np.asarray(embed_topic(topic), dtype=np.float32)
+        similarities = (embeddings @ query) * scales
+        best = int(np.argmax(similarities))
+        if similarities[best] < TOPIC_SIMILARITY_THRESHOLD:
+            return None
+
+        logger.info(f"Reusing results for similar topic: {rows[best][1]}")
+        row = conn.execute(
+            "SELECT results FROM topic_cache WHERE hash = ?", (rows[best][0],)
+        ).fetchone()
+        return orjson.loads(row[0])
 
     def save_results_to_cache(self, topic: str, results: Dict):
         """Save results to cache for future use"""
         logger.info(f"Saving results for topic: {topic}")
-        self.session_state.setdefault("results", {})
-        self.session_state["results"][topic] = results
+        conn = get_topic_cache_connection()
+        embedding, scale = quantize_embedding(embed_topic(topic))
+        now = time.time()
+        # Drop results that can no longer be reused
+        conn.execute(
+            "DELETE FROM topic_cache WHERE content_hash != ? OR created_at < ?",
+            (self.content_hash, now - SEMANTIC_CACHE_TTL),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO topic_cache"
+            " (hash, topic, model, embedding, results, scale, terms, content_hash,"
+            " created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                topic_hash(topic),
+                topic,
+                get_embedder().id,
+                embedding,
+                orjson.dumps(results).decode(),
+                scale,
+                literal_terms(topic),
+                self.content_hash,
+                now,
+            ),
+        )
+        conn.commit()
+
+    async def _research_facets(self, topic: str):
+        """Research each facet of a topic concurrently"""
+        # Retrieve a starting set of excerpts for every facet, with the facet
+        # queries embedded in a single request
+        facet_documents = search_many(
+            self.knowledge_base, [f"{topic} {facet}" for facet in RESEARCH_FACETS]
+        )
+        prompts = [
+            f"Find information about {topic} in Big Tech AI investments, in particular {facet}. Focus on specific numbers, trends, and company details."
+            + "\n\nStart from these knowledge base excerpts:\n"
+            + "\n".join(f"- {document.content}" for document in documents)
+            for facet, documents in zip(RESEARCH_FACETS, facet_documents)
+        ]
+        rate_limit = asyncio.Semaphore(MAX_CONCURRENCY)
+
+        async def research(prompt):
+            async with rate_limit:
+                # Each run gets its own agent copy, since a run keeps state on it
+                return await self.research_agent.deep_copy().arun(prompt)
+
+        return await asyncio.gather(*(research(prompt) for prompt in prompts))
+
+    async def _save_reports(self, topic: str, results: Dict):
+        """Write the report files while the topic is embedded for the cache"""
+        # Save results to files in a dedicated directory
+        report_prefix = topic.replace(" ", "_")
+        # The file writes and the embeddings request all wait on I/O, so they
+        # overlap in worker threads. The cache insert itself stays on this
+        # thread, since the SQLite connection belongs to it.
+        await asyncio.gather(
+            asyncio.to_thread(embed_topic, topic),
+            *(
+                asyncio.to_thread(
+                    Path(REPORTS_DIR, f"{report_prefix}_{name}.md").write_text,
+                    report,
+                    encoding="utf-8",
+                )
+                for name, report in results.items()
+            ),
+        )
 
     def run(self, topic: str, use_cache: bool = True) -> Iterator[RunResponse]:
         """Run the workflow to analyze a topic"""
@@ -151,10 +323,14 @@ class AIInvestmentWorkflow(Workflow):
             content=f"Researching '{topic}'...", event=RunEvent.run_started
         )
 
-        research_prompt = f"Find information about {topic} in Big Tech AI investments. Focus on specific numbers, trends, and company details."
-        research_response = self.research_agent.run(research_prompt)
+        research_responses = asyncio.run(self._research_facets(topic))
+        research_findings = "\n\n".join(
+            f"### {facet.capitalize()}\n\n{response.content}"
+            for facet, response in zip(RESEARCH_FACETS, research_responses)
+            if response and response.content
+        )
 
-        if not research_response or not research_response.content:
+        if not research_findings:
             logger.error("Could not complete research step")
             yield RunResponse(
                 content="Error: Could not complete research step",
@@ -162,22 +338,26 @@ class AIInvestmentWorkflow(Workflow):
             )
             return
 
-        research_findings = research_response.content
         logger.info("Research step completed")
         yield RunResponse(
             content="Research step completed", event=RunEvent.run_response
         )
 
-        # Step 2: Analysis
+        # Steps 2 and 3: Analysis and summary. Both only build on the research,
+        # so one structured run returns them together.
         logger.info(f"Step 2: Analyzing research findings...")
         yield RunResponse(
             content="Analyzing research findings...", event=RunEvent.run_response
         )
+        logger.info(f"Step 3: Creating executive summary...")
+        yield RunResponse(
+            content="Creating executive summary...", event=RunEvent.run_response
+        )
 
-        analysis_prompt = f"Analyze these research findings about {topic} in Big Tech AI investments:\n\n{research_findings}"
-        analysis_response = self.analysis_agent.run(analysis_prompt)
-
-        if not analysis_response or not analysis_response.content:
+        analysis_prompt = f"Analyze these research findings about {topic} in Big Tech AI investments, then create an executive summary of the research and analysis:\n\n{research_findings}"
+        response = self.analysis_agent.run(analysis_prompt)
+        report = response.content if response else None
+        if not isinstance(report, AnalysisReport) or not report.analysis:
             logger.error("Could not complete analysis step")
             yield RunResponse(
                 content="Error: Could not complete analysis step",
@@ -185,22 +365,13 @@ class AIInvestmentWorkflow(Workflow):
             )
             return
 
-        analysis = analysis_response.content
+        analysis = report.analysis
         logger.info("Analysis step completed")
         yield RunResponse(
             content="Analysis step completed", event=RunEvent.run_response
         )
 
-        # Step 3: Summary
-        logger.info(f"Step 3: Creating executive summary...")
-        yield RunResponse(
-            content="Creating executive summary...", event=RunEvent.run_response
-        )
-
-        summary_prompt = f"Create an executive summary about {topic} in Big Tech AI investments based on this research and analysis:\n\nResearch:\n{research_findings}\n\nAnalysis:\n{analysis}"
-        summary_response = self.summary_agent.run(summary_prompt)
-
-        if not summary_response or not summary_response.content:
+        if not report.summary:
             logger.error("Could not complete summary step")
             yield RunResponse(
                 content="Error: Could not complete summary step",
@@ -208,25 +379,10 @@ class AIInvestmentWorkflow(Workflow):
             )
             return
 
-        summary = summary_response.content
+        summary = report.summary
         logger.info("Summary step completed")
         yield RunResponse(content="Summary step completed", event=RunEvent.run_response)
 
-        # Save results to files in a dedicated directory
-        os.makedirs("sqlite_data/reports", exist_ok=True)
-        with open(
-            f"sqlite_data/reports/{topic.replace(' ', '_')}_research.md", "w"
-        ) as f:
-            f.write(research_findings)
-        with open(
-            f"sqlite_data/reports/{topic.replace(' ', '_')}_analysis.md", "w"
-        ) as f:
-            f.write(analysis)
-        with open(
-            f"sqlite_data/reports/{topic.replace(' ', '_')}_summary.md", "w"
-        ) as f:
-            f.write(summary)
-
         # Prepare results
         results = {
             "research": research_findings,
@@ -234,7 +390,8 @@ class AIInvestmentWorkflow(Workflow):
             "summary": summary,
         }
 
-        # Save to cache
+        # Save results to report files and to the cache
+        asyncio.run(self._save_reports(topic, results))
         self.save_results_to_cache(topic, results)
 
         # Return final results
@@ -242,6 +399,8 @@ class AIInvestmentWorkflow(Workflow):
 
 
 def main():
+    # Let arrow keys recall questions from earlier runs
+    enable_input_history()
     print("\n=== Agno Multi-Agent Workflow Demo ===")
     print(
         "This demo shows how to use multiple Agno agents in a workflow to analyze Big Tech AI investments."
@@ -256,25 +415,23 @@ def main():
     print("- competitive landscape")
     print("- future projections")
 
+    # Initialize the workflow once with SQLite storage. Results are cached per
+    # topic in the topic cache table, so all topics can share one session.
+    workflow = AIInvestmentWorkflow(
+        session_id="ai-investment-analysis",
+        storage=SqliteStorage(
+            table_name="ai_investment_workflows",
+            db_file=WORKFLOW_DB_FILE,
+        ),
+        debug_mode=True,
+    )
+
     # Run the workflow
     while True:
         topic = input("\nEnter a topic to analyze (or 'quit' to exit): ")
         if topic.lower() == "quit":
             break
 
-        # Create a URL-safe topic for session ID
-        url_safe_topic = topic.lower().replace(" ", "-")
-
-        # Initialize the workflow with SQLite storage for caching
-        workflow = AIInvestmentWorkflow(
-            session_id=f"ai-investment-analysis-{url_safe_topic}",
-            storage=SqliteStorage(
-                table_name="ai_investment_workflows",
-                db_file="sqlite_data/agno_workflows.db",
-            ),
-            debug_mode=True,
-        )
-
         print(f"\nAnalyzing '{topic}' through the workflow...")
 
         # Run the workflow and collect results
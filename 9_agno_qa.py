@@ -1,20 +1,36 @@
-import json
 import os
 import numpy as np
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List
+from bootstrap import enable_input_history, load_environment
 from openai import OpenAI
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools.reasoning import ReasoningTools
+from embedding_store import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_FILE,
+    LEGACY_EMBEDDING_FILE,
+    convert_legacy_embeddings,
+    load_embeddings,
+    save_embeddings,
+)
 
 # Load environment variables
-load_dotenv()
+load_environment()
 
 completion_model = os.getenv("COMPLETION_MODEL", "gpt-4.1-mini")
+embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+
+# Maximum number of embedding requests sent to OpenAI at the same time
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
 
-# Initialize OpenAI client for embeddings
+# Initialize OpenAI client for embeddings. Rate-limited (429) requests are
+# retried by the client with exponential backoff.
 embedding_client = OpenAI(
     api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=5,
 )
 
 
@@ -24,47 +40,54 @@ def load_content():
         return [line.strip() for line in f if line.strip()]
 
 
-def create_embeddings(texts):
-    """Create embeddings for given texts using the configured embedding model"""
+def create_embeddings(texts, batch_size=EMBEDDING_BATCH_SIZE):
+    """Create embeddings for given texts with one API request per batch of texts
+
+    The requests are I/O-bound, so batches are sent from a thread pool.
+    """
+    batches = [
+        texts[start : start + batch_size] for start in range(0, len(texts), batch_size)
+    ]
+
+    def embed(batch):
+        response = embedding_client.embeddings.create(
+            model=embedding_model, input=batch
+        )
+        # The API returns one item per input, in input order
+        return [item.embedding for item in response.data]
+
+    # map yields results in batch order, so embeddings line up with texts
     embeddings = []
-    model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-    for text in texts:
-        response = embedding_client.embeddings.create(model=model, input=text)
-        embeddings.append(response.data[0].embedding)
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        for batch_embeddings in executor.map(embed, batches):
+            embeddings.extend(batch_embeddings)
     return embeddings
 
 
-def save_embeddings(texts, embeddings):
-    """Save texts and their embeddings to embedding_data/embedding.json"""
-    # Create the embedding_data directory if it doesn't exist
-    os.makedirs("embedding_data", exist_ok=True)
-
-    data = {"texts": texts, "embeddings": embeddings}
-    with open("embedding_data/embedding.json", "w") as f:
-        json.dump(data, f)
-
-
-def load_embeddings():
-    """Load embeddings from embedding_data/embedding.json"""
-    with open("embedding_data/embedding.json", "r") as f:
-        return json.load(f)
+def find_most_similar(query_embedding, store, top_k=3):
+    """Find most similar texts based on cosine similarity"""
+    return find_most_similar_batch([query_embedding], store, top_k)[0]
 
 
-def find_most_similar(query_embedding, embeddings, texts, top_k=3):
-    """Find most similar texts based on cosine similarity"""
-    # Convert embeddings to numpy array for efficient computation
-    embeddings_array = np.array(embeddings)
-    query_array = np.array(query_embedding)
+def find_most_similar_batch(query_embeddings, store, top_k=3):
+    """Find the most similar texts for several queries at once
 
-    # Calculate cosine similarity
-    similarities = np.dot(embeddings_array, query_array) / (
-        np.linalg.norm(embeddings_array, axis=1) * np.linalg.norm(query_array)
-    )
+    The rows of the store's matrix are unit length, so the cosine similarities
+    of all queries are a single float32 matrix product with the normalized queries.
+    """
+    queries = np.asarray(query_embeddings, dtype=np.float32)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    similarities = queries @ store.matrix.T
 
-    # Get indices of top k similar texts
-    top_indices = np.argsort(similarities)[-top_k:]
+    # Get indices of top k similar texts per query: partition in linear time,
+    # then sort only the k selected scores
+    top_k = min(top_k, len(store.texts))
+    top_indices = np.argpartition(similarities, -top_k, axis=1)[:, -top_k:]
+    top_scores = np.take_along_axis(similarities, top_indices, axis=1)
+    order = np.argsort(top_scores, axis=1)
+    top_indices = np.take_along_axis(top_indices, order, axis=1)
 
-    return [texts[i] for i in top_indices]
+    return [[store.texts[i] for i in row] for row in top_indices]
 
 
 # Load embeddings once at module level for reuse
@@ -75,6 +98,13 @@ except Exception as e:
     print(f"Error loading embeddings: {e}")
 
 
+@lru_cache(maxsize=1024)
+def embed_query(query):
+    """Embed a query, once per query"""
+    response = embedding_client.embeddings.create(model=embedding_model, input=query)
+    return tuple(response.data[0].embedding)
+
+
 def get_relevant_context(query: str) -> str:
     """
     Get relevant context for a query using vector search
@@ -90,33 +120,59 @@ def get_relevant_context(query: str) -> str:
     if stored_data is None:
         return "Error: Embeddings not loaded"
 
-    # Create embedding for the query
-    model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-    query_embedding_response = embedding_client.embeddings.create(
-        model=model, input=query
-    )
-    query_embedding = query_embedding_response.data[0].embedding
+    # Create embedding for the query, reusing it when the query repeats
+    query_embedding = embed_query(query)
 
     # Find most relevant context
-    relevant_texts = find_most_similar(
-        query_embedding, stored_data["embeddings"], stored_data["texts"]
-    )
+    relevant_texts = find_most_similar(query_embedding, stored_data)
 
     # Create context from relevant texts
     context = "\n\n".join(relevant_texts)
     return context
 
 
+def get_relevant_contexts(queries: List[str]) -> str:
+    """
+    Get relevant context for several queries at once using vector search
+
+    Args:
+        queries (List[str]): The queries to search for, e.g. one per part of a question
+
+    Returns:
+        str: The relevant context found in the knowledge base, grouped by query
+    """
+    if stored_data is None:
+        return "Error: Embeddings not loaded"
+    if not queries:
+        return "Error: No queries given"
+
+    # Embed all queries with one request and search with one matrix product
+    response = embedding_client.embeddings.create(model=embedding_model, input=queries)
+    results = find_most_similar_batch(
+        [item.embedding for item in response.data], stored_data
+    )
+
+    return "\n\n".join(
+        f"### {query}\n\n" + "\n\n".join(relevant_texts)
+        for query, relevant_texts in zip(queries, results)
+    )
+
+
 def setup_agent():
     """Set up and return an Agno agent for QA"""
 
     # Create the agent with custom tools
     agent = Agent(
         model=OpenAIChat(id=completion_model),
-        tools=[ReasoningTools(add_instructions=True), get_relevant_context],
+        tools=[
+            ReasoningTools(add_instructions=True),
+            get_relevant_context,
+            get_relevant_contexts,
+        ],
         instructions=[
             "You are a helpful assistant specializing in AI investment information.",
             "ALWAYS use the get_relevant_context tool for EVERY query to find information.",
+            "If a question has several parts, use get_relevant_contexts with one search per part.",
             "For general queries like 'summarize', search for 'AI investments Big Tech' to get an overview.",
             "If the user asks about specific companies, use their names in your search.",
             "If the answer cannot be found in the context, say so.",
@@ -131,13 +187,17 @@ def setup_agent():
 
 
 def main():
-    import os.path
-
+    # Let arrow keys recall questions from earlier runs
+    enable_input_history()
+    global stored_data
     # Check if embeddings already exist
-    if os.path.exists("embedding_data/embedding.json"):
+    if os.path.exists(EMBEDDING_FILE):
         print("Loading existing embeddings...")
-        global stored_data
         stored_data = load_embeddings()
+    elif os.path.exists(LEGACY_EMBEDDING_FILE):
+        # Convert embeddings saved as JSON by earlier versions, without the API
+        print("Converting existing embeddings...")
+        stored_data = convert_legacy_embeddings()
     else:
         # Load content and create embeddings
         texts = load_content()
@@ -146,8 +206,7 @@ def main():
 
         # Save embeddings
         print("Saving embeddings...")
-        save_embeddings(texts, embeddings)
-        stored_data = {"texts": texts, "embeddings": embeddings}
+        stored_data = save_embeddings(texts, embeddings)
 
     # Set up the agent
     print("Setting up Agno agent...")
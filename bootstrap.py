@@ -0,0 +1,33 @@
+import atexit
+import os
+import sys
+from functools import lru_cache
+from dotenv import load_dotenv
+
+# Number of entered questions remembered per demo
+INPUT_HISTORY_LENGTH = 1000
+
+
+@lru_cache(maxsize=1)
+def load_environment():
+    """Load environment variables from .env once per process"""
+    load_dotenv(override=False)
+
+
+@lru_cache(maxsize=1)
+def enable_input_history():
+    """Give input() arrow-key history that persists across runs of the current demo"""
+    try:
+        import readline
+    except ImportError:
+        # readline is not available on every platform (e.g. Windows)
+        return
+
+    script_name = os.path.splitext(os.path.basename(sys.argv[0]))[0] or "python"
+    history_file = os.path.expanduser(f"~/.{script_name}_history")
+    try:
+        readline.read_history_file(history_file)
+    except OSError:
+        pass
+    readline.set_history_length(INPUT_HISTORY_LENGTH)
+    atexit.register(readline.write_history_file, history_file)
@@ -0,0 +1,153 @@
+import sys
+import orjson
+from functools import lru_cache
+
+# Define a database of Big Tech companies and their AI investments
+COMPANY_DATABASE = {
+    "microsoft": {
+        "name": "Microsoft",
+        "planned_investment_2025": "$80 billion",
+        "investment_2024": "$53 billion",
+        "key_areas": ["Azure Cloud", "OpenAI Partnership", "Copilot Agents"],
+        "ceo": "Satya Nadella",
+        "stock_impact": "Lost $200 billion in market value after reporting weaker cloud growth",
+        "challenges": [
+            "Glitchy and costly Copilot agents",
+            "Slow enterprise adoption",
+            "ROI concerns",
+        ],
+    },
+    "alphabet": {
+        "name": "Alphabet (Google)",
+        "planned_investment_2025": "$75 billion",
+        "investment_2024": "$53 billion",
+        "key_areas": ["Gemini AI Models", "Cloud Infrastructure", "AI Research"],
+        "ceo": "Sundar Pichai",
+        "stock_impact": "8% drop, fifth-worst trading day in past decade",
+        "challenges": [
+            "Opaque usage metrics for Gemini",
+            "Integrating AI into search without cannibalizing ad revenue",
+        ],
+    },
+    "amazon": {
+        "name": "Amazon",
+        "planned_investment_2025": "$100+ billion",
+        "investment_2024": "$77 billion",
+        "key_areas": ["AWS Data Centers", "AI Infrastructure", "Specialized Chips"],
+        "ceo": "Andy Jassy",
+        "stock_impact": "Fell 7% in after-hours trading after investment announcement",
+        "challenges": ["Distant ROI", "Significant capital expenditure"],
+    },
+    "meta": {
+        "name": "Meta",
+        "planned_investment_2025": "Hundreds of billions",
+        "investment_2024": "$40 billion",
+        "key_areas": ["AI for Ad Targeting", "Llama Models", "AI Infrastructure"],
+        "ceo": "Mark Zuckerberg",
+        "stock_impact": "Positive reception, shares rising despite increased spending",
+        "challenges": ["Regulatory scrutiny", "Competition in AI space"],
+    },
+    "openai": {
+        "name": "OpenAI",
+        "planned_investment_2025": "$100 billion (with partners)",
+        "investment_2024": "Not publicly disclosed",
+        "key_areas": ["GPT Models", "AI Safety", "US Infrastructure"],
+        "ceo": "Sam Altman",
+        "stock_impact": "Private company, valued at $260 billion in recent talks",
+        "challenges": [
+            "Competition from open-source models",
+            "Regulatory concerns",
+            "Governance issues",
+        ],
+    },
+    "deepseek": {
+        "name": "DeepSeek",
+        "planned_investment_2025": "Not publicly disclosed",
+        "investment_2024": "Not publicly disclosed",
+        "key_areas": ["R1 Reasoning Model", "Cost-efficient AI"],
+        "ceo": "Not specified",
+        "stock_impact": "Caused Nvidia shares to plunge 17%, erasing $600 billion in one day",
+        "challenges": [
+            "Limited access to advanced Nvidia GPUs",
+            "Competition from established players",
+        ],
+    },
+}
+
+# Define a database of AI investment metrics and trends
+INVESTMENT_METRICS = {
+    "big_tech_combined_2024": "$246 billion",
+    "big_tech_combined_2023": "$151 billion",
+    "projected_big_tech_2025": "$320+ billion",
+    "growth_rate_2023_to_2024": "63%",
+    "magnificent_seven_capex_growth": "40%",
+    "rest_of_sp500_capex_growth": "3.5%",
+    "magnificent_seven_profit_growth": "33%",
+    "rest_of_sp500_profit_growth": "5%",
+}
+
+
+# Common alternative names for the companies in the database
+COMPANY_ALIASES = {"google": "alphabet", "facebook": "meta"}
+
+
+# Interned company IDs, used to validate lookups and listed in "not found" responses
+COMPANY_IDS = frozenset(sys.intern(company_id) for company_id in COMPANY_DATABASE)
+AVAILABLE_COMPANIES = ", ".join(COMPANY_DATABASE)
+
+
+# The model tends to retry the same unknown name, so the message is cached
+@lru_cache(maxsize=128)
+def company_not_found(company_name):
+    """Build the response for a company that is not in the database"""
+    return f"Company '{company_name}' not found in the database. Available companies: {AVAILABLE_COMPANIES}"
+
+
+def normalize_name(name):
+    """Normalize a tool argument to the casefolded form used by the lookup tables"""
+    return name.strip().casefold()
+
+
+def resolve_company_id(company_name):
+    """Normalize a company name and map common variations to its company ID"""
+    # Names that already are a canonical ID need no normalization
+    if company_name in COMPANY_IDS:
+        return company_name
+    company_name = normalize_name(company_name)
+    return sys.intern(COMPANY_ALIASES.get(company_name, company_name))
+
+
+def to_json(data):
+    """Serialize tool output as compact JSON, since the model doesn't need indentation"""
+    return orjson.dumps(data).decode()
+
+
+# Pre-rendered JSON for the static data returned by the tools
+COMPANY_JSON = {
+    company_id: to_json(company) for company_id, company in COMPANY_DATABASE.items()
+}
+INVESTMENT_METRICS_JSON = to_json(INVESTMENT_METRICS)
+
+# Company fields shown side by side in a comparison
+COMPARE_FIELDS = (
+    "name",
+    "planned_investment_2025",
+    "investment_2024",
+    "key_areas",
+    "ceo",
+    "stock_impact",
+    "challenges",
+)
+
+
+@lru_cache(maxsize=256)
+def build_comparison_json(company1, company2):
+    """Build the JSON comparison for a pair of company IDs"""
+    comp1 = COMPANY_DATABASE[company1]
+    comp2 = COMPANY_DATABASE[company2]
+
+    comparison = {
+        "comparison": {field: [comp1[field], comp2[field]] for field in COMPARE_FIELDS}
+    }
+
+    return to_json(comparison)
@@ -0,0 +1,78 @@
+import os
+import numpy as np
+import orjson
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+# Texts sent per embeddings request (the API accepts up to 2048)
+EMBEDDING_BATCH_SIZE = 512
+
+# Embeddings are stored as unit-length int8 rows with a float32 scale per row,
+# a quarter of the size of float32 vectors. The rows are a raw .npy file, so
+# they are read in a single pass instead of parsed at startup.
+EMBEDDING_FILE = "embedding_data/embedding_int8.npy"
+SCALES_FILE = "embedding_data/embedding_scales.npy"
+TEXTS_FILE = "embedding_data/embedding_texts.json"
+
+# Float embeddings saved as JSON by earlier versions, converted on first run
+LEGACY_EMBEDDING_FILE = "embedding_data/embedding.json"
+
+
+@dataclass(frozen=True)
+class EmbeddingStore:
+    """Texts and the unit-length float32 matrix their embeddings are searched with"""
+
+    texts: Tuple[str, ...]
+    matrix: np.ndarray
+
+
+def quantize_embeddings(embeddings):
+    """Quantize embeddings to unit-length int8 rows plus per-row restoring scales"""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    # All-zero rows are kept as they are instead of turning into NaN
+    matrix /= np.where(norms == 0, 1, norms)
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    vectors = np.round(matrix / scales[:, np.newaxis]).astype(np.int8)
+    return vectors, scales.astype(np.float32)
+
+
+def build_search_matrix(vectors, scales):
+    """Dequantize stored int8 rows once into a contiguous float32 search matrix"""
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32) * scales[:, np.newaxis]
+    # Shared by every search, so it must not change after loading
+    matrix.flags.writeable = False
+    return matrix
+
+
+def save_embeddings(texts, embeddings):
+    """Save texts and their int8-quantized embeddings to embedding_data"""
+    # Create the embedding_data directory if it doesn't exist
+    os.makedirs("embedding_data", exist_ok=True)
+
+    vectors, scales = quantize_embeddings(embeddings)
+    with open(TEXTS_FILE, "wb") as f:
+        f.write(orjson.dumps(texts))
+    np.save(SCALES_FILE, scales)
+    # Written last, since its presence means the embeddings are complete
+    np.save(EMBEDDING_FILE, vectors)
+    return EmbeddingStore(tuple(texts), build_search_matrix(vectors, scales))
+
+
+@lru_cache(maxsize=1)
+def load_embeddings():
+    """Load texts and int8-quantized embeddings from embedding_data, once"""
+    with open(TEXTS_FILE, "rb") as f:
+        texts = orjson.loads(f.read())
+    vectors = np.load(EMBEDDING_FILE)
+    scales = np.load(SCALES_FILE)
+    return EmbeddingStore(tuple(texts), build_search_matrix(vectors, scales))
+
+
+def convert_legacy_embeddings():
+    """Convert embeddings saved as JSON by earlier versions, without the API"""
+    with open(LEGACY_EMBEDDING_FILE, "rb") as f:
+        data = orjson.loads(f.read())
+    return save_embeddings(data["texts"], data["embeddings"])
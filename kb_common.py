@@ -0,0 +1,317 @@
+import os
+import re
+import json
+import hashlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import lancedb
+import numpy as np
+from agno.embedder.openai import OpenAIEmbedder
+from agno.knowledge.text import TextKnowledgeBase
+from agno.vectordb.distance import Distance
+from agno.vectordb.lancedb import LanceDb
+from embedding_store import EMBEDDING_BATCH_SIZE
+
+# Below this many rows a flat scan is as fast as an ANN index, and IVF training
+# needs at least as many rows as partitions, so small tables stay unindexed
+MIN_ROWS_FOR_INDEX = 10_000
+
+# From this many rows on, vectors are product-quantized (1536 float32 values,
+# 6 KB, become 96 one-byte codes) instead of scalar-quantized to int8
+MIN_ROWS_FOR_PQ = 100_000
+
+# Number of IVF partitions probed per query once a table is indexed
+SEARCH_NPROBES = 20
+
+# Prefix of the tables of embeddings kept by content hash, so reloads skip the
+# API. There is one table per model and vector size, since LanceDB vector
+# columns are fixed-size.
+EMBEDDING_CACHE_TABLE = "embedding_cache"
+
+# Size of the vectors used for semantic cache lookups. text-embedding-3 models
+# return shortened embeddings natively, so no separate projection is needed.
+CACHE_EMBEDDING_DIMENSIONS = 256
+
+# Table holding content.txt for the human-loop, team and workflow demos
+SHARED_TABLE_NAME = "embeddings_shared"
+SHARED_TABLE_URI = "lancedb_data"
+
+
+def ensure_vector_index(vector_db, metric="l2"):
+    """Create an ANN index on a LanceDb knowledge base table once it is large enough to benefit"""
+    table = vector_db.table
+    num_rows = table.count_rows()
+    if num_rows < MIN_ROWS_FOR_INDEX:
+        return False
+
+    if any("vector" in index.columns for index in table.list_indices()):
+        return True
+
+    num_partitions = max(1, int(num_rows**0.5))
+    if num_rows < MIN_ROWS_FOR_PQ:
+        print(f"Creating int8 vector index for {num_rows} rows...")
+        table.create_index(
+            metric=metric,
+            vector_column_name="vector",
+            index_type="IVF_HNSW_SQ",
+            num_partitions=num_partitions,
+        )
+    else:
+        dimensions = table.schema.field("vector").type.list_size
+        print(f"Creating product-quantized vector index for {num_rows} rows...")
+        table.create_index(
+            metric=metric,
+            vector_column_name="vector",
+            index_type="IVF_PQ",
+            num_partitions=num_partitions,
+            num_sub_vectors=max(1, dimensions // 16),
+        )
+    return True
+
+
+def like_pattern(text):
+    """Escape text for a LIKE '%...%' filter with ESCAPE '\\'"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("'", "''")
+
+
+def keyword_search(vector_db, keyword, limit=5):
+    """Vector search for a keyword, restricted to rows whose content contains it
+
+    The substring filter is applied before the vector scan, so only matching
+    rows are ranked. agno keeps the document text in a JSON payload column,
+    between the "content" and "usage" keys. Quotes inside the text are
+    escaped there, so anchoring the pattern on both keys matches the content
+    only, and the keyword is JSON-encoded the same way as the text.
+    """
+    encoded = like_pattern(json.dumps(keyword.lower())[1:-1])
+    pattern = f'%"content": "%{encoded}%", "usage": %'
+    rows = (
+        vector_db.table.search(vector_db.embedder.get_embedding(keyword))
+        .where(f"lower(payload) LIKE '{pattern}' ESCAPE '\\'", prefilter=True)
+        .nprobes(vector_db.nprobes or SEARCH_NPROBES)
+        .limit(limit)
+        .to_list()
+    )
+    return [json.loads(row["payload"])["content"] for row in rows]
+
+
+def normalize_embedding(embedding):
+    """Scale an embedding to unit length"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return (vector / norm).tolist() if norm else list(embedding)
+
+
+class EmbeddingCache:
+    """Embeddings stored in LanceDB under a SHA-256 of the model and text"""
+
+    def __init__(self, model, dimensions=None, uri="lancedb_data"):
+        self.db = lancedb.connect(uri)
+        self.table_name = (
+            f"{EMBEDDING_CACHE_TABLE}_{re.sub(r'[^0-9A-Za-z]+', '_', model)}"
+        )
+        if dimensions is not None:
+            self.table_name += f"_{dimensions}"
+
+    @staticmethod
+    def key(model, text):
+        return hashlib.sha256(f"{model}\n{text}".encode()).hexdigest()
+
+    def get_many(self, keys):
+        """Get the cached embeddings for the given keys"""
+        if not keys or self.table_name not in self.db.table_names():
+            return {}
+
+        quoted_keys = ", ".join(f"'{key}'" for key in keys)
+        rows = (
+            self.db.open_table(self.table_name)
+            .search()
+            .where(f"hash IN ({quoted_keys})")
+            .limit(len(keys))
+            .to_list()
+        )
+        return {row["hash"]: list(row["vector"]) for row in rows}
+
+    def put_many(self, embeddings):
+        """Store embeddings by key, replacing existing entries"""
+        rows = [{"hash": key, "vector": vector} for key, vector in embeddings.items()]
+        if not rows:
+            return
+
+        if self.table_name not in self.db.table_names():
+            self.db.create_table(self.table_name, data=rows)
+        else:
+            (
+                self.db.open_table(self.table_name)
+                .merge_insert("hash")
+                .when_matched_update_all()
+                .when_not_matched_insert_all()
+                .execute(rows)
+            )
+
+
+@dataclass
+class NormalizedOpenAIEmbedder(OpenAIEmbedder):
+    """OpenAI embedder that returns unit-length vectors
+
+    For unit vectors L2 distance ranks results exactly like cosine distance,
+    so tables can be searched and indexed with the cheaper L2 metric.
+    Vectors fetched with embed_batch are served from memory afterwards.
+    """
+
+    prefetched: Dict[str, List[float]] = field(default_factory=dict, repr=False)
+    cache: Optional[EmbeddingCache] = field(default=None, repr=False)
+
+    def embed_batch(self, texts, batch_size=EMBEDDING_BATCH_SIZE, persist=True):
+        """Embed texts with one API request per batch instead of one per text
+
+        With a cache, only texts that were never embedded before hit the API.
+        Pass persist=False for one-off texts such as search queries, so they
+        are not written to the cache.
+        """
+        pending = [text for text in dict.fromkeys(texts) if text not in self.prefetched]
+
+        if self.cache is not None:
+            keys = {text: self.cache.key(self.id, text) for text in pending}
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start : start + batch_size]
+                cached = self.cache.get_many([keys[text] for text in batch])
+                for text in batch:
+                    if keys[text] in cached:
+                        self.prefetched[text] = cached[keys[text]]
+            pending = [text for text in pending if text not in self.prefetched]
+
+        fetched = {}
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+            response = self.response(batch)
+            for text, item in zip(batch, response.data):
+                fetched[text] = normalize_embedding(item.embedding)
+        self.prefetched.update(fetched)
+
+        if self.cache is not None and persist:
+            self.cache.put_many(
+                {keys[text]: vector for text, vector in fetched.items()}
+            )
+
+    def get_embedding(self, text):
+        embedding = self.prefetched.pop(text, None)
+        if embedding is not None:
+            return embedding
+        return normalize_embedding(super().get_embedding(text))
+
+    def get_embedding_and_usage(self, text):
+        embedding = self.prefetched.pop(text, None)
+        if embedding is not None:
+            return embedding, None
+        embedding, usage = super().get_embedding_and_usage(text)
+        return normalize_embedding(embedding), usage
+
+
+@lru_cache(maxsize=1)
+def get_embedder():
+    """Get the process-wide embedder, so all knowledge bases share one OpenAI client"""
+    embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    return NormalizedOpenAIEmbedder(
+        id=embedding_model,
+        cache=EmbeddingCache(embedding_model),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_cache_embedder():
+    """Get the embedder for semantic cache lookups, which returns short vectors"""
+    return NormalizedOpenAIEmbedder(
+        id=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+        dimensions=CACHE_EMBEDDING_DIMENSIONS,
+    )
+
+
+@lru_cache(maxsize=1)
+def setup_shared_knowledge_base():
+    """Set up the knowledge base that the demos built on content.txt share
+
+    The content is embedded into one table instead of one table per script.
+    """
+    return TextKnowledgeBase(
+        path="content_data",  # Use the content_data directory which contains content.txt
+        vector_db=LanceDb(
+            table_name=SHARED_TABLE_NAME,
+            uri=SHARED_TABLE_URI,
+            # Only used once the table is large enough to get an index
+            nprobes=SEARCH_NPROBES,
+            # Use unit-length OpenAI embeddings, so L2 distance ranks like cosine
+            embedder=get_embedder(),
+            distance=Distance.l2,
+        ),
+    )
+
+
+def load_in_batches(knowledge_base, document_lists=None):
+    """Load a knowledge base, embedding its documents with one request per batch
+
+    Documents are read from the knowledge base path unless lists of already
+    built documents are passed in.
+    """
+    if document_lists is None:
+        document_lists = knowledge_base.document_lists
+
+    # Start from an empty table, so rows of removed content don't linger
+    knowledge_base.vector_db.drop()
+    embedder = knowledge_base.vector_db.embedder
+    for documents in document_lists:
+        # Prefetch the vectors so the per-document inserts don't call the API
+        embedder.embed_batch([document.content for document in documents])
+        knowledge_base.load_documents(documents, upsert=True)
+    record_loaded_content(knowledge_base)
+
+
+def search_many(knowledge_base, queries):
+    """Search a knowledge base for several queries, embedding them in one request"""
+    # Queries are ad hoc, so they stay out of the corpus embedding cache
+    knowledge_base.vector_db.embedder.embed_batch(queries, persist=False)
+    return [knowledge_base.search(query) for query in queries]
+
+
+def content_hash(path):
+    """Hash the contents of every file under a knowledge base path"""
+    digest = hashlib.sha256()
+    for file in sorted(Path(path).rglob("*")):
+        if file.is_file():
+            digest.update(file.relative_to(path).as_posix().encode() + b"\0")
+            digest.update(file.read_bytes())
+    return digest.hexdigest()
+
+
+def content_manifest_path(vector_db):
+    """Get the file that records which content was loaded into a table"""
+    return Path(vector_db.uri) / f"{vector_db.table_name}.sha256"
+
+
+def record_loaded_content(knowledge_base):
+    """Record the hash of the content just loaded into the knowledge base table"""
+    manifest = content_manifest_path(knowledge_base.vector_db)
+    manifest.parent.mkdir(parents=True, exist_ok=True)
+    manifest.write_text(content_hash(knowledge_base.path))
+
+
+def knowledge_base_is_loaded(knowledge_base):
+    """Check whether an earlier run already loaded the current content into the table
+
+    Asks LanceDB rather than the filesystem, so a table directory left empty
+    by a failed load still counts as not loaded. Content that changed since
+    the last load, or a table loaded before hashes were recorded, also needs
+    a reload; unchanged texts then come from the embedding cache.
+    """
+    vector_db = knowledge_base.vector_db
+    if not (vector_db.exists() and vector_db.get_count() > 0):
+        return False
+
+    manifest = content_manifest_path(vector_db)
+    return manifest.is_file() and manifest.read_text() == content_hash(
+        knowledge_base.path
+    )
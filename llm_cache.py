@@ -0,0 +1,64 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Number of agent answers kept in memory
+LLM_CACHE_SIZE = 1024
+
+# Seconds before a cached answer is asked for again
+LLM_CACHE_TTL = 600
+
+
+class LLMCache:
+    """Content of earlier agent runs, keyed by agent name and exact prompt
+
+    Entries expire after a TTL and the least recently used entry is dropped
+    once the cache is full. A lock keeps concurrent runs from racing.
+    """
+
+    def __init__(self, maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(agent, prompt):
+        return agent.name, hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+
+    def get(self, key):
+        """Get the cached content for a key, or None if it is missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, content = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return content
+
+    def put(self, key, content):
+        """Store the content for a key, dropping the oldest entry when full"""
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, content)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+
+llm_cache = LLMCache()
+
+
+async def cached_arun(agent, prompt):
+    """Run an agent asynchronously, reusing the answer to an identical earlier run"""
+    key = llm_cache.key(agent, prompt)
+    content = llm_cache.get(key)
+    if content is None:
+        response = await agent.arun(prompt)
+        content = response.content if response else None
+        if content:
+            llm_cache.put(key, content)
+    return content
@@ -1,17 +1,50 @@
-import json
+import hashlib
+import re
+import sqlite3
 import numpy as np
-from openai import OpenAI
+from openai import BadRequestError, OpenAI
 import os
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from bootstrap import enable_input_history, load_environment
+from embedding_store import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_FILE,
+    LEGACY_EMBEDDING_FILE,
+    convert_legacy_embeddings,
+    load_embeddings,
+    save_embeddings,
+)
 
 # Load environment variables
-load_dotenv()
+load_environment()
 
 completion_model = os.getenv("COMPLETION_MODEL", "gpt-4.1-mini")
+embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+
+# Maximum number of embedding requests sent to OpenAI at the same time
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+
+# SQLite file of embeddings kept by model and text hash, so repeats skip the API
+EMBEDDING_CACHE_FILE = "embedding_data/cache.db"
+
+CREATE_EMBEDDING_CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    hash BLOB NOT NULL,
+    vec BLOB NOT NULL,
+    PRIMARY KEY (model, hash)
+)
+"""
+
+# Hashes looked up per query, well below SQLite's limit on bound parameters
+CACHE_LOOKUP_CHUNK_SIZE = 500
 
-# Initialize OpenAI-compatible clients
+# Initialize OpenAI-compatible clients. Rate-limited (429) embedding requests
+# are retried by the client with exponential backoff.
 embedding_client = OpenAI(
     api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=5,
 )
 
 # Use OpenRouter if configured, otherwise fall back to OpenAI
@@ -26,72 +59,174 @@ completion_client = OpenAI(
 
 def load_content():
     """Load content from content_data/content.txt, where each line is a separate text entry"""
-    with open("content_data/content.txt", "r") as f:
-        return [line.strip() for line in f if line.strip()]
+    with open("content_data/content.txt", "rb") as f:
+        data = f.read()
+
+    # Split and strip the raw bytes, then decode only the non-empty entries
+    return [line.decode() for line in map(bytes.strip, data.splitlines()) if line]
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache_connection():
+    """Open the embedding cache database"""
+    os.makedirs("embedding_data", exist_ok=True)
+    conn = sqlite3.connect(EMBEDDING_CACHE_FILE)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(CREATE_EMBEDDING_CACHE_SQL)
+    conn.commit()
+    return conn
+
+
+def text_hash(text):
+    """Hash a text for the embedding cache"""
+    return hashlib.sha256(text.encode()).digest()
+
+
+def get_cached_embeddings(texts, model):
+    """Get the cached embeddings of the given texts, keyed by text"""
+    conn = get_embedding_cache_connection()
+    texts_by_hash = {text_hash(text): text for text in texts}
+    hashes = list(texts_by_hash)
+    cached = {}
+    for start in range(0, len(hashes), CACHE_LOOKUP_CHUNK_SIZE):
+        chunk = hashes[start : start + CACHE_LOOKUP_CHUNK_SIZE]
+        rows = conn.execute(
+            "SELECT hash, vec FROM embeddings WHERE model = ?"
+            f" AND hash IN ({', '.join('?' * len(chunk))})",
+            (model, *chunk),
+        )
+        for key, vec in rows:
+            cached[texts_by_hash[key]] = np.frombuffer(vec, dtype=np.float32).tolist()
+    return cached
+
+
+def cache_embeddings(embeddings, model):
+    """Store embeddings keyed by text in the embedding cache"""
+    conn = get_embedding_cache_connection()
+    conn.executemany(
+        "INSERT OR REPLACE INTO embeddings (model, hash, vec) VALUES (?, ?, ?)",
+        [
+            (model, text_hash(text), np.asarray(embedding, dtype=np.float32).tobytes())
+            for text, embedding in embeddings.items()
+        ],
+    )
+    conn.commit()
 
 
-def create_embeddings(texts):
-    """Create embeddings for given texts using the configured embedding model"""
-    embeddings = []
-    model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-    for text in texts:
-        response = embedding_client.embeddings.create(model=model, input=text)
-        embeddings.append(response.data[0].embedding)
-    return embeddings
+# Error codes and messages the API uses for input over its token limits
+TOO_LARGE_ERROR_CODES = {"context_length_exceeded", "max_tokens_per_request"}
+TOO_LARGE_ERROR_PATTERN = re.compile(
+    r"maximum context length|too many tokens|tokens per request|input is too long",
+    re.IGNORECASE,
+)
 
 
-def save_embeddings(texts, embeddings):
-    """Save texts and their embeddings to embedding_data/embedding.json"""
-    data = {"texts": texts, "embeddings": embeddings}
-    with open("embedding_data/embedding.json", "w") as f:
-        json.dump(data, f)
+def is_too_large(error):
+    """Check whether a rejected request failed because its input was too large"""
+    return error.code in TOO_LARGE_ERROR_CODES or bool(
+        TOO_LARGE_ERROR_PATTERN.search(error.message)
+    )
 
 
-def load_embeddings():
-    """Load embeddings from embedding_data/embedding.json"""
-    with open("embedding_data/embedding.json", "r") as f:
-        return json.load(f)
+def embed_texts(texts, model):
+    """Embed texts with a single API request, splitting it if it is too large"""
+    try:
+        response = embedding_client.embeddings.create(model=model, input=texts)
+    except BadRequestError as error:
+        # Only a batch over the per-request token limit is retried, in halves
+        if len(texts) == 1 or not is_too_large(error):
+            raise
+        middle = len(texts) // 2
+        return embed_texts(texts[:middle], model) + embed_texts(texts[middle:], model)
+    data = sorted(response.data, key=lambda item: item.index)
+    return [item.embedding for item in data]
+
+
+def create_embeddings(texts, batch_size=EMBEDDING_BATCH_SIZE):
+    """Create embeddings for given texts with one API request per batch of texts
+
+    Texts embedded before, by this or an earlier run, come from the cache.
+    The requests are I/O-bound, so the remaining batches are sent from a
+    thread pool.
+    """
+    embeddings = get_cached_embeddings(texts, embedding_model)
+    missing = [text for text in dict.fromkeys(texts) if text not in embeddings]
+    batches = [
+        missing[start : start + batch_size]
+        for start in range(0, len(missing), batch_size)
+    ]
+
+    # map yields results in batch order; the cache is written from this thread
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        results = executor.map(
+            lambda batch: embed_texts(batch, embedding_model), batches
+        )
+        for batch, batch_embeddings in zip(batches, results):
+            fetched = dict(zip(batch, batch_embeddings))
+            cache_embeddings(fetched, embedding_model)
+            embeddings.update(fetched)
+    return [embeddings[text] for text in texts]
+
+
+@lru_cache(maxsize=4096)
+def embed_question(question):
+    """Embed a question as a unit-length float32 vector, once per question
+
+    Questions are embedded directly, so they stay out of the persistent cache
+    kept for the texts being searched.
+    """
+    embedding = np.asarray(
+        embed_texts([question], embedding_model)[0], dtype=np.float32
+    )
+    embedding /= np.linalg.norm(embedding)
+    # Shared by every repeat of the question, so it must not change
+    embedding.flags.writeable = False
+    return embedding
 
 
-def find_most_similar(query_embedding, embeddings, texts, top_k=3):
-    """Find most similar texts based on cosine similarity"""
-    # Convert embeddings to numpy array for efficient computation
-    embeddings_array = np.array(embeddings)
-    query_array = np.array(query_embedding)
+def find_most_similar(query_embedding, matrix, texts, top_k=3):
+    """Find most similar texts based on cosine similarity
 
-    # Calculate cosine similarity
-    similarities = np.dot(embeddings_array, query_array) / (
-        np.linalg.norm(embeddings_array, axis=1) * np.linalg.norm(query_array)
-    )
+    The query and the rows of matrix are unit-length float32, so cosine
+    similarity is a single matrix-vector product.
+    """
+    similarities = matrix @ query_embedding
 
-    # Get indices of top k similar texts
-    top_indices = np.argsort(similarities)[-top_k:]
+    # Get indices of top k similar texts: partition in linear time, then sort
+    # only the k selected scores, keeping the most similar text last
+    if top_k >= len(similarities):
+        top_indices = np.argsort(similarities)
+    else:
+        top_indices = np.argpartition(similarities, -top_k)[-top_k:]
+        top_indices = top_indices[np.argsort(similarities[top_indices])]
 
     return [texts[i] for i in top_indices]
 
 
-def answer_question(question):
-    """Answer a question using embeddings and the configured completion model"""
+@lru_cache(maxsize=1024)
+def find_context(question):
+    """Find the context for a question, reusing it when the question repeats"""
     # Create embedding for the question
-    model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-    question_embedding_response = embedding_client.embeddings.create(
-        model=model, input=question
-    )
-    question_embedding = question_embedding_response.data[0].embedding
+    question_embedding = embed_question(question)
 
-    # Load stored embeddings
+    # Get the stored embeddings, loaded on the first question
     stored_data = load_embeddings()
 
     # Find most relevant context
     relevant_texts = find_most_similar(
-        question_embedding, stored_data["embeddings"], stored_data["texts"]
+        question_embedding, stored_data.matrix, stored_data.texts
     )
 
     # Create context from relevant texts
-    context = "\n\n".join(relevant_texts)
+    return "\n\n".join(relevant_texts)
 
-    # Generate answer using the configured model
-    response = completion_client.chat.completions.create(
+
+def answer_question(question):
+    """Answer a question using embeddings and the configured completion model"""
+    context = find_context(question)
+
+    # Generate answer using the configured model, printing it as it streams in
+    stream = completion_client.chat.completions.create(
         model=completion_model,
         messages=[
             {
@@ -100,20 +235,30 @@ def answer_question(question):
             },
             {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"},
         ],
+        stream=True,
     )
 
-    return response.choices[0].message.content
+    parts = []
+    for chunk in stream:
+        text = chunk.choices[0].delta.content if chunk.choices else None
+        if text:
+            print(text, end="", flush=True)
+            parts.append(text)
+    print()
+    return "".join(parts)
 
 
 def main():
-    import os.path
-
+    # Let arrow keys recall questions from earlier runs
+    enable_input_history()
     # Check if embeddings already exist
-    if os.path.exists("embedding_data/embedding.json"):
+    if os.path.exists(EMBEDDING_FILE):
         print("Loading existing embeddings...")
-        stored_data = load_embeddings()
-        texts = stored_data["texts"]
-        embeddings = stored_data["embeddings"]
+        load_embeddings()
+    elif os.path.exists(LEGACY_EMBEDDING_FILE):
+        # Convert embeddings saved as JSON by earlier versions, without the API
+        print("Converting existing embeddings...")
+        convert_legacy_embeddings()
     else:
         # Load content and create embeddings
         texts = load_content()
@@ -131,8 +276,8 @@ def main():
             break
 
         print("\nFinding answer...")
-        answer = answer_question(question)
-        print(f"\nAnswer: {answer}")
+        print("\nAnswer: ", end="", flush=True)
+        answer_question(question)
 
 
 if __name__ == "__main__":
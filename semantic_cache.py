@@ -0,0 +1,127 @@
+import re
+import time
+import lancedb
+from kb_common import CACHE_EMBEDDING_DIMENSIONS, content_hash, get_cache_embedder
+
+# Minimum cosine similarity for a new question to reuse an earlier answer
+SIMILARITY_THRESHOLD = 0.92
+
+# Seconds an answer is reused before the question is answered again
+SEMANTIC_CACHE_TTL = 24 * 60 * 60
+
+# Figures and capitalized names. "$10B" and "$100B" questions embed almost
+# identically, so these must match exactly for an answer to be reused.
+LITERAL_TERM_PATTERN = re.compile(r"\d+(?:[.,]\d+)*|\b[A-Z][\w&-]*")
+
+# Capitalized words that start questions rather than name something
+QUESTION_WORDS = frozenset(
+    {
+        "what",
+        "how",
+        "why",
+        "which",
+        "who",
+        "when",
+        "where",
+        "is",
+        "are",
+        "do",
+        "does",
+        "can",
+        "should",
+        "please",
+        "provide",
+        "give",
+        "explain",
+        "summarize",
+        "compare",
+        "tell",
+        "list",
+        "analyze",
+        "describe",
+    }
+)
+
+
+def literal_terms(question):
+    """Get the figures and names in a question as one comparable string"""
+    terms = {term.casefold() for term in LITERAL_TERM_PATTERN.findall(question)}
+    return " ".join(sorted(terms - QUESTION_WORDS))
+
+
+def quote(value):
+    """Quote a string for a LanceDB filter"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+class SemanticCache:
+    """Answers to earlier questions, looked up by embedding similarity
+
+    Questions are embedded as short unit-length vectors, so the squared L2
+    distance LanceDB returns equals 2 - 2 * cosine similarity. Answers are
+    only reused for the same knowledge base content, within a TTL, and when
+    the figures and names in both questions match.
+    """
+
+    def __init__(
+        self,
+        table_name,
+        knowledge_base,
+        uri="lancedb_data",
+        threshold=SIMILARITY_THRESHOLD,
+        ttl=SEMANTIC_CACHE_TTL,
+    ):
+        self.db = lancedb.connect(uri)
+        # Tables are per vector size, since LanceDB vector columns are fixed-size
+        self.table_name = f"{table_name}_{CACHE_EMBEDDING_DIMENSIONS}"
+        self.max_distance = 2 * (1 - threshold)
+        self.ttl = ttl
+        self.content_hash = content_hash(knowledge_base.path)
+        self.table = None
+        if self.table_name in self.db.table_names():
+            self.table = self.db.open_table(self.table_name)
+
+    def embed(self, question):
+        """Embed a question for lookup and storage"""
+        return get_cache_embedder().get_embedding(question)
+
+    def current_filter(self):
+        """Filter for rows stored for the current content and not yet expired"""
+        return (
+            f"content_hash = {quote(self.content_hash)}"
+            f" AND created_at >= {time.time() - self.ttl}"
+        )
+
+    def lookup(self, question, embedding):
+        """Get the answer to the closest earlier question if it means the same thing"""
+        if self.table is None:
+            return None
+
+        rows = (
+            self.table.search(embedding)
+            .where(
+                f"{self.current_filter()} AND terms = {quote(literal_terms(question))}",
+                prefilter=True,
+            )
+            .limit(1)
+            .to_list()
+        )
+        if rows and rows[0]["_distance"] <= self.max_distance:
+            return rows[0]["response"]
+        return None
+
+    def add(self, question, embedding, response):
+        """Store the answer to a question, dropping stale answers"""
+        row = {
+            "vector": embedding,
+            "question": question,
+            "terms": literal_terms(question),
+            "content_hash": self.content_hash,
+            "created_at": time.time(),
+            "response": response,
+        }
+        if self.table is None:
+            self.table = self.db.create_table(self.table_name, data=[row])
+        else:
+            self.table.delete(f"NOT ({self.current_filter()})")
+            self.table.add([row])